@@ -1,11 +1,87 @@
 from __future__ import annotations
 
-from flask import Flask
+import time
+
+import click
+from flask import Flask, Response, g
 from flask_cors import CORS
 
 from config import Config
 from database import Base, engine
 from routes import bp as api_bp
+from services import read_your_writes
+from services.gazetteer import build_gazetteer
+from services.places import import_overpass_file, refresh_stale_tiles
+from services.pregeneration import pregenerate_quests
+
+
+def register_commands(app: Flask) -> None:
+    @app.cli.command("pregenerate-quests")
+    @click.option("--interval", type=int, default=0, help="Re-run every N seconds instead of once.")
+    def pregenerate_quests_command(interval: int) -> None:
+        """Generate upcoming daily quests for all active users."""
+        while True:
+            result = pregenerate_quests()
+            click.echo(
+                f"users={result.users_considered} created={result.quests_created} "
+                f"existing={result.already_generated} cells={result.cells}"
+            )
+            if interval <= 0:
+                break
+            time.sleep(interval)
+
+    @app.cli.command("import-places")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--bbox", help="south,west,north,east covered by the export; empty tiles inside are marked covered.")
+    def import_places_command(path: str, bbox: str | None) -> None:
+        """Load an Overpass JSON export into the offline place index."""
+        bounds = tuple(float(part) for part in bbox.split(",")) if bbox else None
+        places, tiles = import_overpass_file(path, bounds)
+        click.echo(f"places={places} tiles={tiles}")
+
+    @app.cli.command("refresh-places")
+    @click.option("--max-age-days", type=int, default=Config.PLACE_REFRESH_DAYS, show_default=True)
+    def refresh_places_command(max_age_days: int) -> None:
+        """Re-fetch place tiles older than the given age from Overpass."""
+        refreshed, failures = refresh_stale_tiles(max_age_days)
+        click.echo(f"refreshed={refreshed} failures={failures}")
+
+    @app.cli.command("build-gazetteer")
+    @click.argument("source", type=click.Path(exists=True, dir_okay=False))
+    @click.argument("out", type=click.Path(dir_okay=False))
+    @click.option("--admin1", type=click.Path(exists=True, dir_okay=False), help="GeoNames admin1CodesASCII.txt")
+    @click.option("--min-population", type=int, default=0, show_default=True)
+    def build_gazetteer_command(source: str, out: str, admin1: str | None, min_population: int) -> None:
+        """Compile a GeoNames dump into the offline gazetteer used by /api/geocode."""
+        places, keys = build_gazetteer(source, out, admin1, min_population)
+        click.echo(f"places={places} keys={keys}")
+
+
+def register_session_hooks(app: Flask) -> None:
+    """One database session per request: opened lazily by ``request_session()``, finished here."""
+
+    @app.after_request
+    def commit_request_session(response: Response) -> Response:
+        session = g.get("db_session")
+        if session is not None:
+            if response.status_code >= 500:
+                session.rollback()
+            else:
+                # Runs before the response is sent, so a failed commit still turns into a 500
+                session.commit()
+                user = g.get("current_user")
+                if g.get("db_wrote") and user is not None:
+                    read_your_writes.mark_writer(user.id)
+        return response
+
+    @app.teardown_appcontext
+    def close_request_session(exc: BaseException | None) -> None:
+        for name in ("db_session", "db_replica_session"):
+            session = g.pop(name, None)
+            if session is not None:
+                if exc is not None:
+                    session.rollback()
+                session.close()
 
 
 def create_app() -> Flask:
@@ -15,9 +91,15 @@ def create_app() -> Flask:
     CORS(app, supports_credentials=True)
 
     app.register_blueprint(api_bp)
+    register_session_hooks(app)
+    register_commands(app)
 
     with app.app_context():
         Base.metadata.create_all(bind=engine)
+        # create_all skips indexes added to tables that already exist
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
 
     return app
 
@@ -4,32 +4,34 @@ import functools
 from typing import Callable
 
 from flask import abort, g, request
-from sqlalchemy import select
 
 from database import session_scope
 from models import User
+from services import identity
+from services.activity import activity_tracker
 from services.keyn import keyn_client
 
 
 def _ensure_user(username: str, display_name: str | None = None, email: str | None = None) -> User:
-    with session_scope() as session:
-        user = session.execute(select(User).where(User.username == username)).scalar_one_or_none()
-        if user:
-            return user
-        user = User(
-            username=username,
-            display_name=display_name or username,
-            email=email,
-            quest_preferences={},
-            prefs={}
-        )
-        session.add(user)
-        session.commit()
-        session.refresh(user)
+    user = identity.cached_user(username)
+    if user is not None:
         return user
+    # Its own short transaction on the primary: provisioning is not the caller's write,
+    # so it must neither pin their reads to the primary nor ride on the request's commit
+    with session_scope() as session:
+        return identity.provision_user(session, username, display_name=display_name or username, email=email)
 
 
 def get_current_user() -> User | None:
+    """The authenticated user, resolved once per request and memoized on ``g``."""
+    if "current_user" not in g:
+        g.current_user = user = _resolve_user()
+        if user is not None:
+            activity_tracker.touch(user.id)
+    return g.current_user
+
+
+def _resolve_user() -> User | None:
     debug_user = request.headers.get("X-Debug-User")
     if debug_user:
         return _ensure_user(debug_user)
@@ -64,8 +66,7 @@ def require_user() -> User:
 def login_required(func: Callable):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        user = require_user()
-        g.current_user = user
+        require_user()
         return func(*args, **kwargs)
 
     return wrapper
@@ -0,0 +1,224 @@
+"""
+Local stand-ins for Open-Meteo, Overpass and Nominatim.
+
+Each fake is a threaded HTTP server on 127.0.0.1 with its own latency and
+error profile. Responses are synthetic but deterministic for a given
+request, and every call is counted so the benchmark can report how many
+upstream requests a run really made.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+from urllib.parse import parse_qs, unquote_plus, urlparse
+
+BBOX = re.compile(r"\((-?[\d.]+),(-?[\d.]+),(-?[\d.]+),(-?[\d.]+)\)")
+
+PLACE_TAGS = [
+    {"leisure": "park"},
+    {"amenity": "cafe"},
+    {"amenity": "restaurant"},
+    {"amenity": "fast_food"},
+    {"amenity": "library"},
+    {"shop": "supermarket"},
+    {"tourism": "museum"},
+]
+
+
+@dataclass
+class Profile:
+    """Latency (mean +/- uniform jitter, in ms) and the share of calls answered with ``error_status``."""
+
+    latency_ms: float = 50.0
+    jitter_ms: float = 25.0
+    error_rate: float = 0.0
+    error_status: int = 503
+
+    def delay(self, rng: random.Random) -> float:
+        return max(0.0, self.latency_ms + rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+
+Handler = Callable[[str, dict[str, list[str]], bytes], Any]
+
+
+class FakeUpstream:
+    def __init__(self, name: str, profile: Profile, routes: dict[tuple[str, str], Handler]) -> None:
+        self.name = name
+        self.profile = profile
+        self.routes = routes
+        self.calls: Counter[str] = Counter()
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(name)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"fake-{name}", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> FakeUpstream:
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.errors = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"calls": sum(self.calls.values()), "by_path": dict(self.calls), "errors_injected": self.errors}
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        fake = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _serve(self, method: str) -> None:
+                parsed = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                with fake._lock:
+                    fake.calls[parsed.path] += 1
+                    delay = fake.profile.delay(fake._rng)
+                    failed = fake._rng.random() < fake.profile.error_rate
+                    if failed:
+                        fake.errors += 1
+                time.sleep(delay)
+
+                handler = fake.routes.get((method, parsed.path))
+                if handler is None:
+                    status, payload = 404, {"error": "not found"}
+                elif failed:
+                    status, payload = fake.profile.error_status, {"error": "injected failure"}
+                else:
+                    status, payload = 200, handler(parsed.path, parse_qs(parsed.query), body)
+
+                encoded = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def do_GET(self) -> None:  # noqa: N802 - http.server naming
+                self._serve("GET")
+
+            def do_POST(self) -> None:  # noqa: N802 - http.server naming
+                self._serve("POST")
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return RequestHandler
+
+
+def _seeded(*parts: Any) -> random.Random:
+    return random.Random("|".join(str(part) for part in parts))
+
+
+def _forecast(path: str, query: dict[str, list[str]], body: bytes) -> Any:
+    latitudes = query.get("latitude", ["0"])[0].split(",")
+    longitudes = query.get("longitude", ["0"])[0].split(",")
+    days = int(query.get("forecast_days", ["3"])[0])
+    start = int(time.time()) // 86400 * 86400
+    hours = days * 24
+
+    results = []
+    for lat, lon in zip(latitudes, longitudes):
+        rng = _seeded(lat, lon, start)
+        base = rng.uniform(-5, 28)
+        results.append(
+            {
+                "latitude": float(lat),
+                "longitude": float(lon),
+                "hourly": {
+                    "time": [start + hour * 3600 for hour in range(hours)],
+                    "temperature_2m": [round(base + rng.uniform(-4, 4), 1) for _ in range(hours)],
+                    "relative_humidity_2m": [rng.randint(30, 95) for _ in range(hours)],
+                    "weather_code": [rng.choice([0, 1, 2, 3, 45, 61, 63, 71, 95]) for _ in range(hours)],
+                    "wind_speed_10m": [round(rng.uniform(0, 30), 1) for _ in range(hours)],
+                },
+            }
+        )
+    return results if len(results) > 1 else results[0]
+
+
+def _overpass(places_per_tile: int) -> Handler:
+    def handler(path: str, query: dict[str, list[str]], body: bytes) -> Any:
+        # Raw query text, or form-encoded ``data=`` as Overpass also accepts
+        text = unquote_plus(body.decode())
+        match = BBOX.search(text)
+        if match is None:
+            return {"elements": []}
+        south, west, north, east = (float(value) for value in match.groups())
+        rng = _seeded(south, west, north, east)
+        elements = []
+        for index in range(places_per_tile):
+            tags = dict(rng.choice(PLACE_TAGS))
+            tags["name"] = f"Place {abs(hash((south, west))) % 10000}-{index}"
+            elements.append(
+                {
+                    "type": "node",
+                    "id": abs(hash((south, west, index))),
+                    "lat": rng.uniform(south, north),
+                    "lon": rng.uniform(west, east),
+                    "tags": tags,
+                }
+            )
+        return {"elements": elements}
+
+    return handler
+
+
+def _search(path: str, query: dict[str, list[str]], body: bytes) -> Any:
+    text = query.get("q", [""])[0]
+    rng = _seeded(text)
+    return [
+        {
+            "display_name": f"{text.title()} {index}",
+            "lat": str(rng.uniform(-60, 60)),
+            "lon": str(rng.uniform(-180, 180)),
+            "type": "city",
+            "importance": round(rng.random(), 3),
+            "address": {"city": text.title()},
+        }
+        for index in range(3)
+    ]
+
+
+def _reverse(path: str, query: dict[str, list[str]], body: bytes) -> Any:
+    lat, lon = query.get("lat", ["0"])[0], query.get("lon", ["0"])[0]
+    return {"display_name": f"Near {lat},{lon}", "address": {"suburb": f"Suburb {lat[:5]}"}}
+
+
+def start_fakes(profiles: dict[str, Profile], places_per_tile: int = 60) -> dict[str, FakeUpstream]:
+    """Start the three fakes; ``profiles`` is keyed by upstream name (open_meteo, overpass, nominatim)."""
+    fakes = {
+        "open_meteo": FakeUpstream("open_meteo", profiles["open_meteo"], {("GET", "/v1/forecast"): _forecast}),
+        "overpass": FakeUpstream(
+            "overpass", profiles["overpass"], {("POST", "/api/interpreter"): _overpass(places_per_tile)}
+        ),
+        "nominatim": FakeUpstream(
+            "nominatim", profiles["nominatim"], {("GET", "/search"): _search, ("GET", "/reverse"): _reverse}
+        ),
+    }
+    for fake in fakes.values():
+        fake.start()
+    return fakes
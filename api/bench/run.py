@@ -0,0 +1,290 @@
+"""
+Quest generation benchmark against local fake upstreams.
+
+    BENCH_DATABASE_URL=postgresql+psycopg://sidequest:sidequest@db:5432/sidequest_bench \
+        python -m bench.run --users 200 --concurrency 16
+
+The bench database is dropped and recreated on every run, so it must not be
+the application database. Upstream traffic goes only to the fakes started
+here, so a run needs no network access.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Callable
+
+from bench.fake_upstreams import Profile, start_fakes
+
+# Synthetic users are scattered around these points (lat, lon)
+CITIES = [(45.5019, -73.5674), (49.2827, -123.1207), (43.6532, -79.3832), (51.0447, -114.0719)]
+CATEGORIES = ["photography", "exploration", "social", "fitness", "food", "culture"]
+CONDITIONS = ["clear", "sunny", "cloudy", "rainy", "snowy", "fog"]
+LOCATION_TYPES = ["park", "cafe", "restaurant", "library", "museum", "shop"]
+
+
+@dataclass
+class Phase:
+    name: str
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: dict[int, int] = field(default_factory=dict)
+    wall_seconds: float = 0.0
+
+    def summary(self) -> dict[str, Any]:
+        ordered = sorted(self.latencies)
+
+        def pct(p: float) -> float | None:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 2)
+
+        return {
+            "requests": len(ordered),
+            "errors": self.errors,
+            "statuses": self.statuses,
+            "throughput_rps": round(len(ordered) / self.wall_seconds, 1) if self.wall_seconds else None,
+            "mean_ms": round(statistics.fmean(ordered) * 1000, 2) if ordered else None,
+            "p50_ms": pct(50),
+            "p95_ms": pct(95),
+            "p99_ms": pct(99),
+        }
+
+
+def _drive(phase: Phase, calls: list[Callable[[], int | None]], concurrency: int) -> Phase:
+    lock = threading.Lock()
+
+    def timed(call: Callable[[], int | None]) -> None:
+        started = time.perf_counter()
+        try:
+            status = call()
+            failed = status is not None and status >= 500
+        except Exception:
+            status, failed = None, True
+        elapsed = time.perf_counter() - started
+        with lock:
+            phase.latencies.append(elapsed)
+            if failed:
+                phase.errors += 1
+            if status is not None:
+                phase.statuses[status] = phase.statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, calls))
+    phase.wall_seconds = time.perf_counter() - started
+    return phase
+
+
+def _configure_environment(args: argparse.Namespace, fakes: dict[str, Any]) -> None:
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["OPEN_METEO_URL"] = f"{fakes['open_meteo'].base_url}/v1/forecast"
+    os.environ["OVERPASS_URL"] = f"{fakes['overpass'].base_url}/api/interpreter"
+    os.environ["NOMINATIM_URL"] = fakes["nominatim"].base_url
+    os.environ["SINGLE_FLIGHT_SHARED"] = "false"
+    os.environ.setdefault("GAZETTEER_PATH", "")
+
+
+def _seed(args: argparse.Namespace) -> list[Any]:
+    from database import Base, engine, session_scope
+    from models import QuestTemplate, User
+    from models.quest_template import QuestRarity
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    rng = random.Random(args.seed)
+    rarities = [QuestRarity.COMMON] * 6 + [QuestRarity.RARE] * 3 + [QuestRarity.LEGENDARY]
+    with session_scope() as session:
+        for index in range(args.templates):
+            session.add(
+                QuestTemplate(
+                    name=f"bench_template_{index}",
+                    title=f"Bench quest {index} near {{location}}",
+                    description=f"Find a {{place_type}} and capture {{modifier}} ({index}).",
+                    rarity=rng.choice(rarities),
+                    category=rng.choice(CATEGORIES),
+                    constraints={"place_types": rng.sample(LOCATION_TYPES, 2)},
+                    hints=["Look around", "Take your time"],
+                    weather_conditions=rng.sample(CONDITIONS, rng.randint(0, 2)),
+                    location_types=rng.sample(LOCATION_TYPES, rng.randint(0, 2)),
+                    estimated_duration_minutes=rng.choice([15, 30, 45, 60]),
+                    difficulty_level=rng.randint(1, 5),
+                    weight=rng.choice([50, 100, 150]),
+                )
+            )
+
+        users = []
+        for index in range(args.users):
+            lat, lon = rng.choice(CITIES)
+            user = User(
+                username=f"bench_user_{index}",
+                display_name=f"Bench User {index}",
+                privacy="public",
+                prefs={},
+                quest_preferences={"categories": rng.sample(CATEGORIES, 2)},
+                default_lat=lat + rng.uniform(-0.08, 0.08),
+                default_lon=lon + rng.uniform(-0.08, 0.08),
+                default_location_name=f"Bench area {index % 20}",
+                location_radius_km=rng.choice([1.0, 2.0, 3.0]),
+                onboarding_completed=True,
+            )
+            session.add(user)
+            users.append(user)
+    return users
+
+
+def _clear_quests() -> None:
+    from database import session_scope
+    from models import Quest, Submission
+
+    with session_scope() as session:
+        session.query(Submission).delete()
+        session.query(Quest).delete()
+
+
+def _reset_process_caches() -> None:
+    from services.geocode import geocode_cache
+    from services.places import place_index
+    from services.quest_cache import quest_response_cache
+
+    place_index.invalidate()
+    geocode_cache.clear()
+    quest_response_cache.clear()
+
+
+def _metrics(app: Any) -> dict[str, Any]:
+    with app.test_client() as client:
+        return client.get("/api/health/metrics").get_json()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--templates", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--polls", type=int, default=3, help="Warm /api/today polls per user.")
+    parser.add_argument("--mode", choices=["generator", "today", "both"], default="both")
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=40.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--overpass-latency-ms", type=float, help="Defaults to 5x --latency-ms.")
+    parser.add_argument("--places-per-tile", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args(argv)
+
+    if not args.database_url:
+        parser.error("set --database-url or BENCH_DATABASE_URL (a scratch database; it is dropped)")
+    if args.database_url == os.getenv("DATABASE_URL"):
+        parser.error("the bench database must not be the application DATABASE_URL")
+
+    profile = Profile(args.latency_ms, args.jitter_ms, args.error_rate)
+    overpass_latency = args.overpass_latency_ms if args.overpass_latency_ms is not None else args.latency_ms * 5
+    fakes = start_fakes(
+        {
+            "open_meteo": profile,
+            "overpass": Profile(overpass_latency, args.jitter_ms, args.error_rate),
+            "nominatim": profile,
+        },
+        places_per_tile=args.places_per_tile,
+    )
+    _configure_environment(args, fakes)
+
+    # Imported only now: modules read their configuration at import time
+    from app import create_app
+    from quest_service import quest_generator
+
+    app = create_app()
+    users = _seed(args)
+    report: dict[str, Any] = {"config": vars(args), "phases": {}}
+
+    def record(phase: Phase) -> None:
+        report["phases"][phase.name] = {
+            **phase.summary(),
+            "upstream_calls": {name: fake.stats() for name, fake in fakes.items()},
+            "metrics": _metrics(app),
+        }
+        for fake in fakes.values():
+            fake.reset_counts()
+
+    try:
+        if args.mode in ("generator", "both"):
+            target = date.today()
+
+            def generate(user: Any) -> None:
+                quest_generator.generate_quest_for_user(user.id, target)
+
+            calls = [lambda user=user: generate(user) for user in users]
+            record(_drive(Phase("generator_cold"), calls, args.concurrency))
+            _clear_quests()
+            record(_drive(Phase("generator_warm_caches"), calls, args.concurrency))
+            _clear_quests()
+            _reset_process_caches()
+
+        if args.mode in ("today", "both"):
+            client_local = threading.local()
+
+            def get_today(user: Any, etag: str | None = None) -> int:
+                client = getattr(client_local, "client", None)
+                if client is None:
+                    client = client_local.client = app.test_client()
+                headers = {"X-Debug-User": user.username}
+                if etag:
+                    headers["If-None-Match"] = etag
+                response = client.get("/api/today", headers=headers)
+                etags[user.id] = response.headers.get("ETag")
+                return response.status_code
+
+            etags: dict[int, str | None] = {}
+            record(_drive(Phase("today_cold"), [lambda user=user: get_today(user) for user in users], args.concurrency))
+            polls = [lambda user=user: get_today(user) for user in users for _ in range(args.polls)]
+            record(_drive(Phase("today_polls"), polls, args.concurrency))
+            revalidations = [lambda user=user: get_today(user, etags.get(user.id)) for user in users]
+            record(_drive(Phase("today_if_none_match"), revalidations, args.concurrency))
+    finally:
+        for fake in fakes.values():
+            fake.stop()
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2, default=str)
+        print()
+    else:
+        _print_report(report)
+    return 0
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    header = f"{'phase':<24}{'reqs':>7}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  upstream calls"
+    print(header)
+    print("-" * len(header))
+    for name, phase in report["phases"].items():
+        upstream = " ".join(f"{key}={value['calls']}" for key, value in phase["upstream_calls"].items())
+        print(
+            f"{name:<24}{phase['requests']:>7}{phase['errors']:>6}{phase['throughput_rps'] or 0:>9}"
+            f"{phase['p50_ms'] or 0:>10}{phase['p95_ms'] or 0:>10}{phase['p99_ms'] or 0:>10}  {upstream}"
+        )
+    print()
+    for name, phase in report["phases"].items():
+        metrics = phase["metrics"] or {}
+        caches = {
+            key: f"{value.get('hits', 0)}/{value.get('hits', 0) + value.get('stale_hits', 0) + value.get('misses', 0)}"
+            for key, value in metrics.items()
+            if isinstance(value, dict) and "hits" in value
+        }
+        print(f"{name}: cache hits/lookups so far {caches}  single_flight={metrics.get('single_flight')}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,6 +12,17 @@ class Config:
     DATABASE_URL: str = os.getenv(
         "DATABASE_URL", "postgresql+psycopg://sidequest:sidequest@db:5432/sidequest"
     )
+    # Optional streaming replica for handlers marked @read_only; a user's reads stay on the primary
+    # for REPLICA_READ_YOUR_WRITES_SECONDS after they write (should exceed the usual replica lag)
+    DATABASE_REPLICA_URL: str | None = os.getenv("DATABASE_REPLICA_URL") or None
+    REPLICA_READ_YOUR_WRITES_SECONDS: int = int(os.getenv("REPLICA_READ_YOUR_WRITES_SECONDS", "10"))
+    # Connection pool (per process, per database) and a server-side per-statement limit; 0 disables the limit
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT_SECONDS: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://redis:6379/0")
 
     # MinIO Configuration
@@ -26,6 +37,11 @@ class Config:
     KEYN_CLIENT_ID: str | None = os.getenv("KEYN_CLIENT_ID")
     KEYN_CLIENT_SECRET: str | None = os.getenv("KEYN_CLIENT_SECRET")
     KEYN_REDIRECT_URI: str | None = os.getenv("KEYN_REDIRECT_URI")
+    # Signing keys are refreshed in the background this often; an unknown kid refetches at most once per
+    # KEYN_JWKS_MIN_REFETCH_SECONDS. Verified claims are cached per token until it expires.
+    KEYN_JWKS_REFRESH_SECONDS: int = int(os.getenv("KEYN_JWKS_REFRESH_SECONDS", "3600"))
+    KEYN_JWKS_MIN_REFETCH_SECONDS: int = int(os.getenv("KEYN_JWKS_MIN_REFETCH_SECONDS", "30"))
+    KEYN_TOKEN_CACHE_MAX_ENTRIES: int = int(os.getenv("KEYN_TOKEN_CACHE_MAX_ENTRIES", "10000"))
     COOKIE_NAME: str = os.getenv("COOKIE_NAME", "sq_session")
 
     VAPID_PUBLIC_KEY: str | None = os.getenv("VAPID_PUBLIC_KEY")
@@ -34,6 +50,91 @@ class Config:
 
     PREFERRED_URL_SCHEME: str = os.getenv("PREFERRED_URL_SCHEME", "https")
 
+    # Quest pre-generation
+    DEFAULT_TIMEZONE: str = os.getenv("DEFAULT_TIMEZONE", "UTC")
+    QUEST_DELIVERY_HOUR: int = int(os.getenv("QUEST_DELIVERY_HOUR", "7"))
+    QUEST_PREGENERATE_LEAD_HOURS: int = int(os.getenv("QUEST_PREGENERATE_LEAD_HOURS", "3"))
+    QUEST_ACTIVE_USER_DAYS: int = int(os.getenv("QUEST_ACTIVE_USER_DAYS", "14"))
+    # Request activity is buffered and written to users.last_active_at in one UPDATE per flush;
+    # a user's timestamp is rewritten at most once per ACTIVITY_MIN_INTERVAL_SECONDS
+    ACTIVITY_FLUSH_SECONDS: float = float(os.getenv("ACTIVITY_FLUSH_SECONDS", "5"))
+    ACTIVITY_MIN_INTERVAL_SECONDS: int = int(os.getenv("ACTIVITY_MIN_INTERVAL_SECONDS", "60"))
+    QUEST_BATCH_SIZE: int = int(os.getenv("QUEST_BATCH_SIZE", "500"))
+    QUEST_BATCH_WORKERS: int = int(os.getenv("QUEST_BATCH_WORKERS", "8"))
+    GEO_CELL_DEGREES: float = float(os.getenv("GEO_CELL_DEGREES", "0.05"))
+
+    # Upstream endpoints (overridable for self-hosted mirrors or the benchmark's fakes)
+    OPEN_METEO_URL: str = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+    OVERPASS_URL: str = os.getenv("OVERPASS_URL", "https://overpass-api.de/api/interpreter")
+    NOMINATIM_URL: str = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org")
+
+    # Upstream fan-out: weather and places are fetched concurrently under one deadline
+    UPSTREAM_FANOUT_WORKERS: int = int(os.getenv("UPSTREAM_FANOUT_WORKERS", "32"))
+    QUEST_CONTEXT_DEADLINE_SECONDS: float = float(os.getenv("QUEST_CONTEXT_DEADLINE_SECONDS", "4"))
+
+    # Outbound HTTP connection pools (one per upstream)
+    HTTP_POOL_HOSTS: int = int(os.getenv("HTTP_POOL_HOSTS", "4"))
+    HTTP_POOL_MAXSIZE: int = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))
+
+    # Upstream circuit breakers (per upstream, over the last BREAKER_WINDOW calls)
+    BREAKER_WINDOW: int = int(os.getenv("BREAKER_WINDOW", "20"))
+    BREAKER_MIN_CALLS: int = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+    BREAKER_FAILURE_RATE: float = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+    BREAKER_COOLDOWN_SECONDS: float = float(os.getenv("BREAKER_COOLDOWN_SECONDS", "30"))
+
+    # Weather: hourly forecasts per cell, fetched a few days at a time
+    WEATHER_CELL_DEGREES: float = float(os.getenv("WEATHER_CELL_DEGREES", "0.1"))
+    WEATHER_CACHE_MAX_ENTRIES: int = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "5000"))
+    FORECAST_DAYS: int = int(os.getenv("FORECAST_DAYS", "3"))
+    FORECAST_REFRESH_SECONDS: int = int(os.getenv("FORECAST_REFRESH_SECONDS", "10800"))
+    FORECAST_BATCH_CELLS: int = int(os.getenv("FORECAST_BATCH_CELLS", "50"))
+
+    # Geocode cache (Nominatim allows ~1 req/s)
+    GEOCODE_CACHE_TTL_SECONDS: int = int(os.getenv("GEOCODE_CACHE_TTL_SECONDS", "86400"))
+    GEOCODE_STALE_SECONDS: int = int(os.getenv("GEOCODE_STALE_SECONDS", "604800"))
+    GEOCODE_CACHE_MAX_ENTRIES: int = int(os.getenv("GEOCODE_CACHE_MAX_ENTRIES", "10000"))
+    GEOCODE_NEGATIVE_TTL_SECONDS: int = int(os.getenv("GEOCODE_NEGATIVE_TTL_SECONDS", "3600"))
+    GEOCODE_REVERSE_DECIMALS: int = int(os.getenv("GEOCODE_REVERSE_DECIMALS", "4"))  # ~11 m
+    GEOCODE_STORE: str = os.getenv("GEOCODE_STORE", "postgres")  # postgres | redis (REDIS_URL)
+
+    # Optional offline gazetteer for forward geocoding (build with `flask build-gazetteer`)
+    GAZETTEER_PATH: str | None = os.getenv("GAZETTEER_PATH")
+    GAZETTEER_MIN_PREFIX: int = int(os.getenv("GAZETTEER_MIN_PREFIX", "2"))
+    GAZETTEER_SCAN_LIMIT: int = int(os.getenv("GAZETTEER_SCAN_LIMIT", "1000"))
+
+    # Offline place index (tiles are fetched from Overpass once, then served locally)
+    PLACE_TILE_DEGREES: float = float(os.getenv("PLACE_TILE_DEGREES", "0.1"))
+    PLACE_BUCKET_DEGREES: float = float(os.getenv("PLACE_BUCKET_DEGREES", "0.01"))
+    PLACE_INDEX_RELOAD_SECONDS: int = int(os.getenv("PLACE_INDEX_RELOAD_SECONDS", "3600"))
+    PLACE_TILE_RETRY_SECONDS: int = int(os.getenv("PLACE_TILE_RETRY_SECONDS", "60"))
+    PLACE_REFRESH_DAYS: int = int(os.getenv("PLACE_REFRESH_DAYS", "30"))
+
+    # Place ranking: distance share of the radius plus these penalties
+    PLACE_SCORE_TYPE_PENALTY: float = float(os.getenv("PLACE_SCORE_TYPE_PENALTY", "0.5"))
+    PLACE_SCORE_REPEAT_PENALTY: float = float(os.getenv("PLACE_SCORE_REPEAT_PENALTY", "1.0"))
+    PLACE_NOVELTY_QUESTS: int = int(os.getenv("PLACE_NOVELTY_QUESTS", "14"))
+    PLACE_CANDIDATES: int = int(os.getenv("PLACE_CANDIDATES", "30"))
+
+    # Compiled template index; writes in this process invalidate it immediately
+    TEMPLATE_INDEX_TTL_SECONDS: int = int(os.getenv("TEMPLATE_INDEX_TTL_SECONDS", "300"))
+
+    # Serialized /api/today responses per (user, date); status changes in this process evict them
+    TODAY_CACHE_TTL_SECONDS: int = int(os.getenv("TODAY_CACHE_TTL_SECONDS", "60"))
+    TODAY_CACHE_MAX_ENTRIES: int = int(os.getenv("TODAY_CACHE_MAX_ENTRIES", "20000"))
+
+    # Username -> user snapshot for request authentication; profile writes in this process evict entries
+    IDENTITY_CACHE_TTL_SECONDS: int = int(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "30"))
+    IDENTITY_CACHE_MAX_ENTRIES: int = int(os.getenv("IDENTITY_CACHE_MAX_ENTRIES", "10000"))
+
+    # Single-flight: identical concurrent upstream lookups share one call.
+    # SINGLE_FLIGHT_SHARED extends this across worker processes via a Redis lock.
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = float(os.getenv("REDIS_SOCKET_TIMEOUT_SECONDS", "0.5"))
+    SINGLE_FLIGHT_SHARED: bool = os.getenv("SINGLE_FLIGHT_SHARED", "false").lower() == "true"
+    SINGLE_FLIGHT_LOCK_SECONDS: float = float(os.getenv("SINGLE_FLIGHT_LOCK_SECONDS", "30"))
+    SINGLE_FLIGHT_WAIT_SECONDS: float = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "15"))
+    SINGLE_FLIGHT_RESULT_SECONDS: float = float(os.getenv("SINGLE_FLIGHT_RESULT_SECONDS", "10"))
+    SINGLE_FLIGHT_POLL_SECONDS: float = float(os.getenv("SINGLE_FLIGHT_POLL_SECONDS", "0.05"))
+
 
 @lru_cache
 def get_config() -> Config:
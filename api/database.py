@@ -1,13 +1,110 @@
+import bisect
+import functools
+import threading
+import time
 from contextlib import contextmanager
+from typing import Any, Callable
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import DeclarativeBase, scoped_session, sessionmaker
+from flask import g, has_request_context
+from sqlalchemy import Engine, create_engine, event, exc, make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.orm import DeclarativeBase, Session, scoped_session, sessionmaker
 
 from config import Config
+from services import read_your_writes
 
-engine = create_engine(Config.DATABASE_URL, echo=False, future=True)
-SessionLocal = scoped_session(
-    sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
+# Upper bounds (ms) of the checkout wait histogram buckets; the last bucket is open-ended
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class CheckoutWaits:
+    """Histogram of how long pool checkouts took (including new connects), plus timeout count."""
+
+    def __init__(self) -> None:
+        self._counts = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._total = 0.0
+        self._max = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(WAIT_BUCKETS_MS, seconds * 1000)] += 1
+            self._total += seconds
+            self._max = max(self._max, seconds)
+            self.timeouts += timed_out
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            count = sum(self._counts)
+            labels = [f"le_{bound}ms" for bound in WAIT_BUCKETS_MS] + ["inf"]
+            return {
+                "checkouts": count,
+                "timeouts": self.timeouts,
+                "mean_ms": round(self._total / count * 1000, 3) if count else None,
+                "max_ms": round(self._max * 1000, 3),
+                "histogram": dict(zip(labels, self._counts)),
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """``QueuePool`` that records every checkout's wait in its class's ``waits``."""
+
+    waits = CheckoutWaits()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.waits.observe(time.perf_counter() - started, timed_out)
+
+
+class ReplicaQueuePool(TimedQueuePool):
+    waits = CheckoutWaits()
+
+
+def _engine_options(url: str, poolclass: type[TimedQueuePool]) -> dict[str, Any]:
+    if make_url(url).get_backend_name() != "postgresql":
+        return {}
+    options: dict[str, Any] = {
+        "poolclass": poolclass,
+        "pool_size": Config.DB_POOL_SIZE,
+        "max_overflow": Config.DB_MAX_OVERFLOW,
+        "pool_timeout": Config.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": Config.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": Config.DB_POOL_PRE_PING,
+    }
+    if Config.DB_STATEMENT_TIMEOUT_MS > 0:
+        # Set per connection at connect time by both psycopg and psycopg2
+        options["connect_args"] = {"options": f"-c statement_timeout={Config.DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+engine = create_engine(
+    Config.DATABASE_URL, echo=False, future=True, **_engine_options(Config.DATABASE_URL, TimedQueuePool)
+)
+SessionFactory = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
+SessionLocal = scoped_session(SessionFactory)
+
+replica_engine = (
+    create_engine(
+        Config.DATABASE_REPLICA_URL,
+        echo=False,
+        future=True,
+        **_engine_options(Config.DATABASE_REPLICA_URL, ReplicaQueuePool),
+    )
+    if Config.DATABASE_REPLICA_URL
+    else None
+)
+ReplicaSessionFactory = (
+    sessionmaker(bind=replica_engine, autoflush=False, autocommit=False, expire_on_commit=False)
+    if replica_engine is not None
+    else None
 )
 
 
@@ -26,3 +123,98 @@ def session_scope():
         raise
     finally:
         session.close()
+
+
+def read_only(func: Callable) -> Callable:
+    """Route decorator: the handler's ``request_scope()`` reads from the replica when one is configured.
+
+    Reads still go to the primary for a user who wrote within
+    ``REPLICA_READ_YOUR_WRITES_SECONDS``, so they always see their own writes.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def _use_replica() -> bool:
+    if ReplicaSessionFactory is None or not g.get("db_read_only"):
+        return False
+    user = g.get("current_user")
+    return user is None or not read_your_writes.wrote_recently(user.id)
+
+
+def request_session(primary: bool = False) -> Session:
+    """The current request's session, created on first use.
+
+    A session only checks out a pooled connection when it first executes,
+    so requests that never touch the database never take one. ``app.py``
+    commits it once after the response is built and closes it at teardown.
+    In ``@read_only`` handlers this is a replica session unless ``primary``
+    is set.
+    """
+    if not primary and _use_replica():
+        session = g.get("db_replica_session")
+        if session is None:
+            session = g.db_replica_session = ReplicaSessionFactory()
+        return session
+    session = g.get("db_session")
+    if session is None:
+        session = g.db_session = SessionFactory()
+    return session
+
+
+@contextmanager
+def request_scope(primary: bool = False):
+    """``request_session()`` inside a request, a ``session_scope()`` anywhere else.
+
+    In a request the block's changes are flushed on exit, so ids and
+    constraint errors surface where the work happened; the commit is left
+    to the request teardown.
+    """
+    if not has_request_context():
+        with session_scope() as session:
+            yield session
+        return
+    session = request_session(primary)
+    yield session
+    session.flush()
+
+
+@event.listens_for(SessionFactory, "after_flush")
+def _note_flush_write(session: Session, flush_context) -> None:
+    if has_request_context() and session is g.get("db_session"):
+        g.db_wrote = True
+
+
+@event.listens_for(SessionFactory, "do_orm_execute")
+def _note_statement_write(state) -> None:
+    if (state.is_insert or state.is_update or state.is_delete) and has_request_context():
+        if state.session is g.get("db_session"):
+            g.db_wrote = True
+
+
+def pool_stats() -> dict[str, Any]:
+    """Live pool occupancy plus the checkout wait histogram, for the primary and any replica."""
+    stats = _pool_stats(engine)
+    if replica_engine is not None:
+        stats["replica"] = _pool_stats(replica_engine)
+    return stats
+
+
+def _pool_stats(bound: Engine) -> dict[str, Any]:
+    pool = bound.pool
+    occupancy: dict[str, Any] = {"status": pool.status()}
+    if isinstance(pool, QueuePool):
+        occupancy.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(0, pool.overflow()),
+            max_overflow=pool._max_overflow,
+        )
+    waits = pool.waits.stats() if isinstance(pool, TimedQueuePool) else None
+    return {**occupancy, "waits": waits}
@@ -1,7 +1,9 @@
+from .geocode import GeocodeEntry
 from .location import Location
+from .place import Place, PlaceTile
 from .quest_template import QuestTemplate, QuestRarity
 from .user import User
 from .quest import Quest
 from .submission import Submission, Vote
 
-__all__ = ["Location", "QuestTemplate", "QuestRarity", "User", "Quest", "Submission", "Vote"]
+__all__ = ["GeocodeEntry", "Location", "Place", "PlaceTile", "QuestTemplate", "QuestRarity", "User", "Quest", "Submission", "Vote"]
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import DateTime, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from database import Base
+
+
+class GeocodeEntry(Base):
+    """A cached Nominatim answer, shared by every API worker.
+
+    Empty answers are stored too (``payload`` of ``[]`` or a null
+    ``display_name``) with a shorter expiry, so misses are not re-queried.
+    """
+
+    __tablename__ = "geocode_cache"
+
+    key: Mapped[str] = mapped_column(String(512), primary_key=True)  # search:<query> | reverse:<lat>,<lon>
+    payload: Mapped[Any] = mapped_column(JSONB, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True, nullable=False)
+    fetched_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, Float, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from database import Base
+
+
+class Place(Base):
+    """A point of interest from OpenStreetMap, stored for offline lookup."""
+
+    __tablename__ = "places"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    osm_id: Mapped[str] = mapped_column(String(32), unique=True, nullable=False)  # e.g. node/123
+    name: Mapped[str | None] = mapped_column(String(255))
+    kind: Mapped[str] = mapped_column(String(32), nullable=False)  # park | cafe | shop | ...
+    lat: Mapped[float] = mapped_column(Float, nullable=False)
+    lon: Mapped[float] = mapped_column(Float, nullable=False)
+    address: Mapped[str | None] = mapped_column(String(255))
+    tile: Mapped[str] = mapped_column(String(32), index=True, nullable=False)
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class PlaceTile(Base):
+    """Marks a tile as covered so an empty tile is not re-fetched from Overpass."""
+
+    __tablename__ = "place_tiles"
+
+    tile: Mapped[str] = mapped_column(String(32), primary_key=True)
+    place_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    source: Mapped[str] = mapped_column(String(16), default="overpass", nullable=False)  # overpass | import
+    fetched_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
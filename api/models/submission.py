@@ -3,7 +3,7 @@ Submission and related models for quest submissions and voting.
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, JSON, Float, UniqueConstraint
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, JSON, Float, UniqueConstraint, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 
 from database import Base
@@ -22,6 +22,12 @@ class Submission(Base):
     score_cache: Mapped[float | None] = mapped_column(Float)
     ratings_count: Mapped[int] = mapped_column(Integer, default=0)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    
+    # Keyset pagination (services/pagination.py): feed by status, "my submissions" by user
+    __table_args__ = (
+        Index("ix_submissions_status_created", "status", "created_at", "id"),
+        Index("ix_submissions_user_created", "user_id", "created_at", "id"),
+    )
 
 
 class Vote(Base):
@@ -1,8 +1,41 @@
 from flask import jsonify
 
+from database import pool_stats
+from services.activity import activity_tracker
+from services.gazetteer import get_gazetteer
+from services.geocode import geocode_cache
+from services.http import upstream_stats
+from services.identity import identity_cache
+from services.keyn import keyn_client
+from services.places import place_index
+from services.quest_cache import quest_response_cache
+from services.quest_pipeline import pipeline_stats
+from services.singleflight import single_flight
+from services.weather import forecast_store
 from . import bp
 
 
 @bp.get("/health")
 def health_check():
     return jsonify({"ok": True})
+
+
+@bp.get("/health/metrics")
+def health_metrics():
+    """Process-local cache and upstream counters for monitoring."""
+    return jsonify(
+        {
+            "db_pool": pool_stats(),
+            "forecast": forecast_store.stats(),
+            "place_index": place_index.stats(),
+            "today_cache": quest_response_cache.stats(),
+            "geocode_cache": geocode_cache.stats(),
+            "identity_cache": identity_cache.stats(),
+            "keyn": keyn_client.stats(),
+            "activity": activity_tracker.stats(),
+            "gazetteer": gazetteer.stats() if (gazetteer := get_gazetteer()) is not None else None,
+            "single_flight": single_flight.stats(),
+            "quest_pipeline": pipeline_stats(),
+            "upstreams": upstream_stats(),
+        }
+    )
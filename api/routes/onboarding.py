@@ -7,8 +7,10 @@ from flask import jsonify, request
 from sqlalchemy import select
 
 from auth import login_required, require_user
-from database import session_scope
+from database import request_scope
 from models import Location, User
+from services import geocode as geocoding
+from services.pregeneration import is_valid_timezone
 from . import bp
 
 
@@ -59,7 +61,10 @@ def update_preferences():
     display_name = payload.get("display_name")
     privacy = payload.get("privacy")
 
-    with session_scope() as session:
+    if isinstance(prefs, dict) and "timezone" in prefs and not is_valid_timezone(prefs["timezone"]):
+        return jsonify({"error": "prefs.timezone must be an IANA timezone name"}), 400
+
+    with request_scope() as session:
         db_user = session.get(User, user.id)
         if db_user is None:
             return jsonify({"error": "User not found"}), 404
@@ -92,7 +97,7 @@ def update_location():
     except (KeyError, TypeError, ValueError):
         return jsonify({"error": "lat and lon are required"}), 400
 
-    label = payload.get("name") or payload.get("label")
+    label = payload.get("name") or payload.get("label") or geocoding.label_for(lat, lon)
     radius_raw = payload.get("radius_km")
     try:
         radius_km = float(radius_raw) if radius_raw is not None else None
@@ -107,7 +112,7 @@ def update_location():
 
     source = payload.get("source", "manual")
 
-    with session_scope() as session:
+    with request_scope() as session:
         db_user = session.get(User, user.id)
         if db_user is None:
             return jsonify({"error": "User not found"}), 404
@@ -146,7 +151,7 @@ def register_notifications():
     if not isinstance(endpoint, str) or not endpoint.strip():
         return jsonify({"error": "endpoint is required"}), 400
 
-    with session_scope() as session:
+    with request_scope() as session:
         db_user = session.get(User, user.id)
         if db_user is None:
             return jsonify({"error": "User not found"}), 404
@@ -163,7 +168,7 @@ def register_notifications():
 def unregister_notifications():
     user = require_user()
 
-    with session_scope() as session:
+    with request_scope() as session:
         db_user = session.get(User, user.id)
         if db_user is None:
             return jsonify({"error": "User not found"}), 404
@@ -184,7 +189,7 @@ def complete_step():
     if step not in {"location", "preferences", "notifications", "complete"}:
         return jsonify({"error": "invalid step"}), 400
 
-    with session_scope() as session:
+    with request_scope() as session:
         db_user = session.get(User, user.id)
         if db_user is None:
             return jsonify({"error": "User not found"}), 404
@@ -290,28 +295,10 @@ def geocode():
         return jsonify({"error": "q parameter required"}), 400
 
     try:
-        response = requests.get(
-            "https://nominatim.openstreetmap.org/search",
-            params={"q": query, "format": "json", "limit": 5, "addressdetails": 1},
-            headers={"User-Agent": "SideQuest/1.0"},
-            timeout=10,
-        )
-        response.raise_for_status()
+        results = geocoding.search(query)
     except requests.RequestException as exc:
         return jsonify({"error": f"lookup_failed: {exc}"}), 502
 
-    results = []
-    for item in response.json():
-        results.append(
-            {
-                "display_name": item.get("display_name"),
-                "lat": float(item.get("lat")),
-                "lon": float(item.get("lon")),
-                "type": item.get("type"),
-                "importance": item.get("importance"),
-                "address": item.get("address", {}),
-            }
-        )
     return jsonify({"locations": results})
 
 
@@ -328,23 +315,10 @@ def reverse_geocode():
         return jsonify({"error": "lat and lon are required"}), 400
 
     try:
-        response = requests.get(
-            "https://nominatim.openstreetmap.org/reverse",
-            params={
-                "lat": lat,
-                "lon": lon,
-                "format": "jsonv2",
-                "addressdetails": 1,
-            },
-            headers={"User-Agent": "SideQuest/1.0"},
-            timeout=10,
-        )
-        response.raise_for_status()
+        data = geocoding.reverse(lat, lon)
     except requests.RequestException as exc:
         return jsonify({"error": f"lookup_failed: {exc}"}), 502
 
-    data = response.json() or {}
-
     result = {
         "display_name": data.get("display_name"),
         "lat": lat,
@@ -6,8 +6,9 @@ from datetime import datetime, date
 from flask import request, jsonify
 
 from auth import login_required, require_user  
-from database import session_scope
+from database import read_only, request_scope
 from models import Submission, Quest, User
+from services.pagination import keyset_page, parse_limit
 from . import bp
 
 
@@ -31,7 +32,7 @@ def create_submission():
     if len(caption) > 500:
         return jsonify({"error": "Caption too long (max 500 characters)"}), 400
     
-    with session_scope() as session:
+    with request_scope() as session:
         # Verify quest exists and belongs to user
         quest = session.query(Quest).filter(
             Quest.id == quest_id,
@@ -80,11 +81,12 @@ def create_submission():
 
 @bp.route("/submissions/<int:submission_id>", methods=["GET"])
 @login_required
+@read_only
 def get_submission(submission_id: int):
     """Get a specific submission."""
     user = require_user()
     
-    with session_scope() as session:
+    with request_scope() as session:
         submission = session.query(Submission).filter(
             Submission.id == submission_id
         ).first()
@@ -118,7 +120,7 @@ def update_submission(submission_id: int):
     if not data:
         return jsonify({"error": "Request data required"}), 400
     
-    with session_scope() as session:
+    with request_scope() as session:
         submission = session.query(Submission).filter(
             Submission.id == submission_id,
             Submission.user_id == user.id
@@ -160,7 +162,7 @@ def delete_submission(submission_id: int):
     """Delete a submission (owner only)."""
     user = require_user()
     
-    with session_scope() as session:
+    with request_scope() as session:
         submission = session.query(Submission).filter(
             Submission.id == submission_id,
             Submission.user_id == user.id
@@ -182,26 +184,26 @@ def delete_submission(submission_id: int):
 
 @bp.route("/submissions/feed", methods=["GET"])
 @login_required  
+@read_only
 def get_submissions_feed():
-    """Get global submissions feed."""
+    """Get global submissions feed, newest first, one cursor page at a time."""
     user = require_user()
     
     # Query parameters
-    page = int(request.args.get('page', 1))
-    limit = min(int(request.args.get('limit', 20)), 50)  # Max 50 per page
-    offset = (page - 1) * limit
+    cursor = request.args.get('cursor')
+    limit = parse_limit(request.args.get('limit'))
+    with_count = request.args.get('count') == 'true'
     
-    with session_scope() as session:
-        # Get visible submissions ordered by creation time (newest first)
+    with request_scope() as session:
+        # Visible submissions; served by ix_submissions_status_created
         submissions_query = session.query(Submission).filter(
             Submission.status == 'visible'
-        ).order_by(Submission.created_at.desc())
-        
-        # Get total count for pagination
-        total_count = submissions_query.count()
+        )
         
-        # Get paginated results
-        submissions = submissions_query.offset(offset).limit(limit).all()
+        try:
+            submissions, next_cursor = keyset_page(submissions_query, Submission, cursor, limit)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
         
         # Get user information for each submission
         user_ids = [s.user_id for s in submissions]
@@ -235,36 +237,32 @@ def get_submissions_feed():
         
         return jsonify({
             "feed": feed_items,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total_count,
-                "pages": (total_count + limit - 1) // limit,
-                "has_next": offset + limit < total_count,
-                "has_prev": page > 1
-            }
+            "pagination": _pagination(submissions_query, limit, next_cursor, with_count)
         })
 
 
 @bp.route("/submissions/my", methods=["GET"])
 @login_required
+@read_only
 def get_my_submissions():
-    """Get current user's submissions."""
+    """Get current user's submissions, newest first, one cursor page at a time."""
     user = require_user()
     
     # Query parameters
-    page = int(request.args.get('page', 1))
-    limit = min(int(request.args.get('limit', 20)), 50)
-    offset = (page - 1) * limit
+    cursor = request.args.get('cursor')
+    limit = parse_limit(request.args.get('limit'))
+    with_count = request.args.get('count') == 'true'
     
-    with session_scope() as session:
-        # Get user's submissions
+    with request_scope() as session:
+        # User's submissions; served by ix_submissions_user_created
         submissions_query = session.query(Submission).filter(
             Submission.user_id == user.id
-        ).order_by(Submission.created_at.desc())
+        )
         
-        total_count = submissions_query.count()
-        submissions = submissions_query.offset(offset).limit(limit).all()
+        try:
+            submissions, next_cursor = keyset_page(submissions_query, Submission, cursor, limit)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
         
         # Get associated quests for context
         quest_ids = [s.quest_id for s in submissions]
@@ -299,12 +297,17 @@ def get_my_submissions():
         
         return jsonify({
             "submissions": items,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total_count,
-                "pages": (total_count + limit - 1) // limit,
-                "has_next": offset + limit < total_count,
-                "has_prev": page > 1
-            }
-        })
\ No newline at end of file
+            "pagination": _pagination(submissions_query, limit, next_cursor, with_count)
+        })
+
+
+def _pagination(query, limit: int, next_cursor: str | None, with_count: bool) -> dict:
+    """Cursor pagination block; the total is only counted when the client asks (``?count=true``)."""
+    pagination = {
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "has_next": next_cursor is not None,
+    }
+    if with_count:
+        pagination["total"] = query.order_by(None).count()
+    return pagination
@@ -0,0 +1,123 @@
+"""
+Write-behind tracking of ``users.last_active_at``.
+
+Requests only note the caller in a dict; a background thread writes every
+pending timestamp with one ``UPDATE ... FROM (VALUES ...)`` per flush.
+Each process buffers its own callers, and a user already written within
+``ACTIVITY_MIN_INTERVAL_SECONDS`` is not buffered again, so steady traffic
+costs at most one row write per user per interval.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, column, or_, update, values
+
+from config import Config
+from database import session_scope
+from models import User
+
+logger = logging.getLogger(__name__)
+
+
+# Two bind parameters per row; stays well under the driver's 65535 limit
+FLUSH_CHUNK_ROWS = 5000
+
+
+def _update_statement(rows: list[tuple[int, datetime]]):
+    seen = values(column("id", Integer), column("seen_at", DateTime), name="seen").data(rows)
+    return (
+        update(User)
+        .where(User.id == seen.c.id)
+        .where(or_(User.last_active_at.is_(None), User.last_active_at < seen.c.seen_at))
+        .values(last_active_at=seen.c.seen_at)
+    )
+
+
+class ActivityTracker:
+    def __init__(self) -> None:
+        self._pending: dict[int, datetime] = {}
+        # user id -> monotonic time of the last write that included them
+        self._written: dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._flusher: threading.Thread | None = None
+        self.touches = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.failures = 0
+
+    def touch(self, user_id: int) -> None:
+        """Record that ``user_id`` is active now; never touches the database."""
+        now = time.monotonic()
+        with self._lock:
+            self.touches += 1
+            written = self._written.get(user_id)
+            if written is not None and now - written < Config.ACTIVITY_MIN_INTERVAL_SECONDS:
+                return
+            self._pending[user_id] = datetime.utcnow()
+            # Marked as written now so the rest of the interval skips the dict write too
+            self._written[user_id] = now
+            if self._flusher is None:
+                self._start()
+
+    def flush(self) -> int:
+        """Write every pending timestamp (one statement per chunk of users); returns the number written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._prune()
+        if not pending:
+            return 0
+
+        try:
+            with session_scope() as session:
+                rows = list(pending.items())
+                for start in range(0, len(rows), FLUSH_CHUNK_ROWS):
+                    session.execute(
+                        _update_statement(rows[start:start + FLUSH_CHUNK_ROWS]),
+                        execution_options={"synchronize_session": False},
+                    )
+        except Exception as exc:
+            logger.warning("Activity flush of %d users failed; retrying next flush: %s", len(pending), exc)
+            with self._lock:
+                self.failures += 1
+                for user_id, seen_at in pending.items():
+                    self._pending[user_id] = max(seen_at, self._pending.get(user_id, seen_at))
+            return 0
+
+        with self._lock:
+            self.flushes += 1
+            self.rows_written += len(pending)
+        return len(pending)
+
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - Config.ACTIVITY_MIN_INTERVAL_SECONDS
+        for user_id in [user_id for user_id, written in self._written.items() if written < cutoff]:
+            del self._written[user_id]
+
+    def _start(self) -> None:
+        def run() -> None:
+            while True:
+                time.sleep(Config.ACTIVITY_FLUSH_SECONDS)
+                self.flush()
+
+        self._flusher = threading.Thread(target=run, name="activity-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "touches": self.touches,
+                "flushes": self.flushes,
+                "rows_written": self.rows_written,
+                "failures": self.failures,
+            }
+
+
+activity_tracker = ActivityTracker()
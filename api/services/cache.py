@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry and hit/miss/eviction counters.
+
+    Entries set with a ``stale_ttl`` are kept past expiry for that long so
+    ``lookup`` can still hand out the last known good value.
+    """
+
+    def __init__(self, name: str, max_entries: int, default_ttl: float) -> None:
+        self.name = name
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data: OrderedDict[Hashable, tuple[float, float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        found = self.lookup(key)
+        if found is None or not found[1]:
+            return default
+        return found[0]
+
+    def lookup(self, key: Hashable) -> tuple[Any, bool] | None:
+        """Return ``(value, fresh)``, where a stale value is past expiry but within its stale window."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, stale_until, value = entry
+            now = time.monotonic()
+            if stale_until <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            if expires_at <= now:
+                self.stale_hits += 1
+                return value, False
+            self.hits += 1
+            return value, True
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None, stale_ttl: float = 0) -> None:
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, expires_at + stale_ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+from typing import Any, Callable
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Shared by every request thread; upstream calls are I/O bound
+_pool = ThreadPoolExecutor(max_workers=Config.UPSTREAM_FANOUT_WORKERS, thread_name_prefix="upstream")
+
+
+def gather_with_deadline(
+    sources: dict[str, tuple[Callable[[], Any], Any]],
+    deadline: float,
+) -> dict[str, Any]:
+    """Run every source concurrently and collect results until ``deadline`` seconds pass.
+
+    ``sources`` maps a name to ``(call, fallback)``. Results are taken as each
+    call finishes; a source that raises or has not finished by the deadline
+    yields its fallback. Late calls keep running in the pool so their results
+    still land in the upstream caches for the next request.
+    """
+    results = {name: fallback for name, (_, fallback) in sources.items()}
+    futures = {_pool.submit(call): name for name, (call, _) in sources.items()}
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as exc:
+                logger.warning("Upstream source %s failed: %s", name, exc)
+    except FuturesTimeout:
+        missed = sorted(name for future, name in futures.items() if not future.done())
+        logger.warning("Upstream deadline of %.1fs hit; using fallback for %s", deadline, ", ".join(missed))
+    return results
+
+
+def submit_background(call: Callable[[], Any]) -> Future:
+    """Run ``call`` on the upstream pool without waiting for it."""
+    return _pool.submit(call)
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import csv
+import heapq
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import unicodedata
+from typing import Any
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# File layout: header | place records | key records (sorted by key bytes) | string blob.
+# Fixed-width records let lookups binary-search the mapped file without loading it.
+MAGIC = b"SQGAZ001"
+HEADER = struct.Struct("<8sIIIII")  # magic, places, keys, places_off, keys_off, blob_off
+PLACE = struct.Struct("<ffIIHB2s")  # lat, lon, population, display_off, display_len, name_len, country
+KEY = struct.Struct("<IHI")  # key_off, key_len, place
+
+# GeoNames "geoname" table columns used by the builder
+GEONAMES_NAME, GEONAMES_ASCII, GEONAMES_LAT, GEONAMES_LON = 1, 2, 4, 5
+GEONAMES_CLASS, GEONAMES_COUNTRY, GEONAMES_ADMIN1, GEONAMES_POPULATION = 6, 8, 10, 14
+
+
+def fold(text: str) -> str:
+    """Lower-case, accent-free, whitespace-collapsed form used for index keys."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.lower().split())
+
+
+def _place_type(population: int) -> str:
+    if population >= 100_000:
+        return "city"
+    if population >= 10_000:
+        return "town"
+    return "village"
+
+
+def build_gazetteer(
+    source: str,
+    out: str,
+    admin1_path: str | None = None,
+    min_population: int = 0,
+) -> tuple[int, int]:
+    """Compile a GeoNames dump (e.g. ``cities15000.txt``) into a gazetteer file.
+
+    Only populated places (feature class ``P``) are kept. ``admin1_path``
+    points at ``admin1CodesASCII.txt`` so display names carry the region.
+    The file is written next to ``out`` and renamed over it, so running
+    workers keep their old mapping until they reopen. Returns (places, keys).
+    """
+    admin1: dict[str, str] = {}
+    if admin1_path:
+        with open(admin1_path, encoding="utf-8") as handle:
+            for row in csv.reader(handle, delimiter="\t", quoting=csv.QUOTE_NONE):
+                if len(row) >= 2:
+                    admin1[row[0]] = row[1]
+
+    places: list[tuple[float, float, int, str, int, str]] = []
+    keys: list[tuple[bytes, int, int]] = []
+    with open(source, encoding="utf-8") as handle:
+        for row in csv.reader(handle, delimiter="\t", quoting=csv.QUOTE_NONE):
+            if len(row) <= GEONAMES_POPULATION or row[GEONAMES_CLASS] != "P":
+                continue
+            population = int(row[GEONAMES_POPULATION] or 0)
+            if population < min_population:
+                continue
+            name = row[GEONAMES_NAME]
+            country = row[GEONAMES_COUNTRY][:2].upper()
+            region = admin1.get(f"{country}.{row[GEONAMES_ADMIN1]}")
+            display = ", ".join(part for part in (name, region, country) if part)
+            index = len(places)
+            places.append(
+                (float(row[GEONAMES_LAT]), float(row[GEONAMES_LON]), population, display, len(name.encode()), country)
+            )
+            for key in {fold(name), fold(row[GEONAMES_ASCII])}:
+                if key:
+                    keys.append((key.encode(), population, index))
+
+    # Equal keys keep the most populous place first
+    keys.sort(key=lambda item: (item[0], -item[1]))
+
+    blob = bytearray()
+    place_section = bytearray()
+    for lat, lon, population, display, name_len, country in places:
+        encoded = display.encode()
+        place_section += PLACE.pack(
+            lat, lon, min(population, 0xFFFFFFFF), len(blob), len(encoded), min(name_len, 255), country.encode()
+        )
+        blob += encoded
+    key_section = bytearray()
+    for key, _, index in keys:
+        key_section += KEY.pack(len(blob), len(key), index)
+        blob += key
+
+    places_off = HEADER.size
+    keys_off = places_off + len(place_section)
+    blob_off = keys_off + len(key_section)
+    tmp = f"{out}.tmp"
+    with open(tmp, "wb") as handle:
+        handle.write(HEADER.pack(MAGIC, len(places), len(keys), places_off, keys_off, blob_off))
+        handle.write(place_section)
+        handle.write(key_section)
+        handle.write(blob)
+    os.replace(tmp, out)
+    return len(places), len(keys)
+
+
+class Gazetteer:
+    """Read-only, memory-mapped place-name index with ranked prefix search.
+
+    The mapping is shared through the page cache, so every worker process
+    opening the same file costs the memory once.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.place_count, self.key_count, self._places_off, self._keys_off, self._blob_off = (
+            HEADER.unpack_from(self._map, 0)
+        )
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a gazetteer file")
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, position: int) -> tuple[bytes, int]:
+        key_off, key_len, place = KEY.unpack_from(self._map, self._keys_off + position * KEY.size)
+        start = self._blob_off + key_off
+        return self._map[start : start + key_len], place
+
+    def _lower_bound(self, prefix: bytes) -> int:
+        lo, hi = 0, self.key_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid)[0] < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _place(self, index: int) -> dict[str, Any]:
+        lat, lon, population, display_off, display_len, name_len, country = PLACE.unpack_from(
+            self._map, self._places_off + index * PLACE.size
+        )
+        start = self._blob_off + display_off
+        raw = self._map[start : start + display_len]
+        display = raw.decode()
+        parts = display.split(", ")
+        return {
+            "display_name": display,
+            "lat": round(lat, 5),
+            "lon": round(lon, 5),
+            "type": _place_type(population),
+            "importance": round(min(1.0, math.log10(population + 1) / 8), 3),
+            "address": {
+                "city": raw[:name_len].decode() if name_len < 255 else parts[0],
+                "state": parts[1] if len(parts) == 3 else None,
+                "country_code": country.decode().lower(),
+            },
+        }
+
+    def search(self, query: str, limit: int = 5) -> list[dict[str, Any]]:
+        """Places whose name starts with the text before the first comma.
+
+        Text after commas must appear in the display name ("springfield, il").
+        Exact name matches rank first, then larger populations.
+        """
+        head, *qualifiers = [fold(part) for part in query.split(",")]
+        qualifiers = [part for part in qualifiers if part]
+        prefix = head.encode()
+        if len(prefix) < Config.GAZETTEER_MIN_PREFIX:
+            return []
+
+        ranked: dict[int, tuple[bool, int]] = {}
+        position = self._lower_bound(prefix)
+        end = min(self.key_count, position + Config.GAZETTEER_SCAN_LIMIT)
+        while position < end:
+            key, place = self._key(position)
+            if not key.startswith(prefix):
+                break
+            population = PLACE.unpack_from(self._map, self._places_off + place * PLACE.size)[2]
+            exact = key == prefix
+            if ranked.get(place, (False, 0)) < (exact, population):
+                ranked[place] = (exact, population)
+            position += 1
+
+        results = []
+        for place in heapq.nlargest(len(ranked), ranked, key=ranked.__getitem__):
+            entry = self._place(place)
+            if qualifiers:
+                folded = fold(entry["display_name"])
+                if not all(part in folded for part in qualifiers):
+                    continue
+            results.append(entry)
+            if len(results) >= limit:
+                break
+        if results:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return results
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "path": self.path,
+            "places": self.place_count,
+            "keys": self.key_count,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_gazetteer: Gazetteer | None = None
+_load_failed = False
+_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer | None:
+    """The configured gazetteer, opened on first use; ``None`` when ``GAZETTEER_PATH`` is unset or unreadable."""
+    global _gazetteer, _load_failed
+    if _gazetteer is not None or _load_failed or not Config.GAZETTEER_PATH:
+        return _gazetteer
+    with _lock:
+        if _gazetteer is None and not _load_failed:
+            try:
+                _gazetteer = Gazetteer(Config.GAZETTEER_PATH)
+                logger.info("Gazetteer loaded: %d places from %s", _gazetteer.place_count, Config.GAZETTEER_PATH)
+            except (OSError, ValueError) as exc:
+                _load_failed = True
+                logger.warning("Gazetteer unavailable, geocoding via Nominatim only: %s", exc)
+    return _gazetteer
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import heapq
+import math
+from operator import itemgetter
+from typing import Iterable, TypeVar
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+# Slack on the planar pre-filter; survivors are re-checked with haversine
+PLANAR_SLACK = 1.01
+
+T = TypeVar("T")
+
+
+def cell_for(lat: float, lon: float, size_deg: float) -> tuple[float, float]:
+    """Snap a coordinate to the centre of its ``size_deg`` grid cell."""
+    cell_lat = (math.floor(lat / size_deg) + 0.5) * size_deg
+    cell_lon = (math.floor(lon / size_deg) + 0.5) * size_deg
+    return round(cell_lat, 6), round(cell_lon, 6)
+
+
+def cell_half_diagonal_km(lat: float, size_deg: float) -> float:
+    """Upper bound on the distance from a cell centre to any point in the cell."""
+    half_lat_km = size_deg / 2 * KM_PER_DEGREE
+    half_lon_km = size_deg / 2 * KM_PER_DEGREE * math.cos(math.radians(lat))
+    return math.hypot(half_lat_km, half_lon_km)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in km."""
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dlat / 2) ** 2
+        + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    )
+    return EARTH_RADIUS_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def k_nearest(
+    lat: float,
+    lon: float,
+    points: Iterable[tuple[float, float, T]],
+    k: int,
+    radius_km: float,
+) -> list[tuple[float, T]]:
+    """The ``k`` nearest ``(lat, lon, item)`` points within ``radius_km``, as (distance_km, item).
+
+    Candidates are compared in one pass on a local equirectangular projection
+    (two multiplies per point, no trig), the ``k`` best are picked with a
+    partial sort, and only those get an exact haversine distance. At quest
+    radii the projection error is far below the slack allowed for it.
+    """
+    kx = KM_PER_DEGREE * math.cos(math.radians(lat))
+    limit = (radius_km * PLANAR_SLACK) ** 2
+    scored = []
+    for point_lat, point_lon, item in points:
+        dy = (point_lat - lat) * KM_PER_DEGREE
+        dx = (point_lon - lon) * kx
+        squared = dx * dx + dy * dy
+        if squared <= limit:
+            scored.append((squared, point_lat, point_lon, item))
+
+    nearest = []
+    for _, point_lat, point_lon, item in heapq.nsmallest(k, scored, key=itemgetter(0)):
+        distance = haversine_km(lat, lon, point_lat, point_lon)
+        if distance <= radius_km:
+            nearest.append((distance, item))
+    return nearest
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from typing import Any, Callable
+
+import requests
+
+from config import Config
+from services.cache import TTLCache
+from services.gazetteer import get_gazetteer
+from services.geocode_store import geocode_store
+from services.http import upstream
+from services.resilience import get_or_revalidate
+
+NOMINATIM_URL = Config.NOMINATIM_URL
+MAX_QUERY_LENGTH = 200
+
+# Address parts tried, most specific first, when labelling a saved location
+LABEL_ADDRESS_KEYS = ("neighbourhood", "suburb", "village", "town", "city", "municipality", "county")
+
+# In-process tier in front of the shared geocode store
+geocode_cache = TTLCache(
+    name="geocode",
+    max_entries=Config.GEOCODE_CACHE_MAX_ENTRIES,
+    default_ttl=Config.GEOCODE_CACHE_TTL_SECONDS,
+)
+
+
+def _is_empty(value: Any) -> bool:
+    if isinstance(value, dict):
+        return not value.get("display_name")
+    return not value
+
+
+def _ttl(value: Any) -> float:
+    if _is_empty(value):
+        return Config.GEOCODE_NEGATIVE_TTL_SECONDS
+    return Config.GEOCODE_CACHE_TTL_SECONDS
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())[:MAX_QUERY_LENGTH]
+
+
+def quantize(lat: float, lon: float) -> tuple[float, float]:
+    """Snap a point to the ``GEOCODE_REVERSE_DECIMALS`` grid reverse lookups are cached on."""
+    decimals = Config.GEOCODE_REVERSE_DECIMALS
+    return round(lat, decimals), round(lon, decimals)
+
+
+def _read_through(key: str, fetch: Callable[[], Any]) -> Any:
+    """Serve ``key`` from the shared store, calling Nominatim only when it is missing or expired.
+
+    An expired answer is still returned if Nominatim is unreachable.
+    """
+    stored = geocode_store.get(key)
+    if stored is not None and stored.fresh:
+        return stored.payload
+    try:
+        value = fetch()
+    except requests.RequestException:
+        if stored is not None:
+            return stored.payload
+        raise
+    geocode_store.put(key, value, _ttl(value))
+    return value
+
+
+def search(query: str) -> list[dict[str, Any]]:
+    """Forward geocode ``query``; raises ``requests.RequestException`` when nothing is cached.
+
+    With a gazetteer configured, queries it can answer never reach Nominatim.
+    """
+    gazetteer = get_gazetteer()
+    if gazetteer is not None:
+        results = gazetteer.search(query)
+        if results:
+            return results
+
+    normalized = normalize_query(query)
+
+    def fetch() -> list[dict[str, Any]]:
+        response = upstream("nominatim").get(
+            f"{NOMINATIM_URL}/search",
+            params={"q": normalized, "format": "json", "limit": 5, "addressdetails": 1},
+        )
+        response.raise_for_status()
+        return [
+            {
+                "display_name": item.get("display_name"),
+                "lat": float(item.get("lat")),
+                "lon": float(item.get("lon")),
+                "type": item.get("type"),
+                "importance": item.get("importance"),
+                "address": item.get("address", {}),
+            }
+            for item in response.json()
+        ]
+
+    key = f"search:{normalized}"
+    return get_or_revalidate(
+        geocode_cache, key, lambda: _read_through(key, fetch), ttl=_ttl, stale_ttl=Config.GEOCODE_STALE_SECONDS
+    )
+
+
+def reverse(lat: float, lon: float) -> dict[str, Any]:
+    """Reverse geocode the quantized point; raises ``requests.RequestException`` when nothing is cached.
+
+    Points Nominatim cannot resolve come back with a ``None`` display name.
+    """
+    lat, lon = quantize(lat, lon)
+
+    def fetch() -> dict[str, Any]:
+        response = upstream("nominatim").get(
+            f"{NOMINATIM_URL}/reverse",
+            params={
+                "lat": lat,
+                "lon": lon,
+                "format": "jsonv2",
+                "addressdetails": 1,
+            },
+        )
+        response.raise_for_status()
+        data = response.json() or {}
+        return {"display_name": data.get("display_name"), "address": data.get("address", {})}
+
+    key = f"reverse:{lat},{lon}"
+    return get_or_revalidate(
+        geocode_cache, key, lambda: _read_through(key, fetch), ttl=_ttl, stale_ttl=Config.GEOCODE_STALE_SECONDS
+    )
+
+
+def label_for(lat: float, lon: float) -> str | None:
+    """Short human label for a point, or ``None`` if it cannot be resolved right now."""
+    try:
+        data = reverse(lat, lon)
+    except requests.RequestException:
+        return None
+    address = data.get("address") or {}
+    for part in LABEL_ADDRESS_KEYS:
+        if address.get(part):
+            return address[part]
+    return data.get("display_name")
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import Config
+from database import session_scope
+from models import GeocodeEntry
+from services.redis_client import RedisError, get_redis
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class StoredAnswer:
+    payload: Any
+    expires_at: datetime
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires_at > datetime.utcnow()
+
+
+class PostgresGeocodeStore:
+    """Geocode answers in the ``geocode_cache`` table; expired rows stay until overwritten."""
+
+    name = "postgres"
+
+    def get(self, key: str) -> StoredAnswer | None:
+        try:
+            with session_scope() as session:
+                entry = session.get(GeocodeEntry, key)
+                if entry is None:
+                    return None
+                return StoredAnswer(entry.payload, entry.expires_at)
+        except SQLAlchemyError as exc:
+            logger.warning("Geocode store read failed for %s: %s", key, exc)
+            return None
+
+    def put(self, key: str, payload: Any, ttl_seconds: float) -> None:
+        now = datetime.utcnow()
+        values = {"key": key, "payload": payload, "expires_at": now + timedelta(seconds=ttl_seconds), "fetched_at": now}
+        stmt = insert(GeocodeEntry).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[GeocodeEntry.key],
+            set_={"payload": stmt.excluded.payload, "expires_at": stmt.excluded.expires_at, "fetched_at": now},
+        )
+        try:
+            with session_scope() as session:
+                session.execute(stmt)
+        except SQLAlchemyError as exc:
+            logger.warning("Geocode store write failed for %s: %s", key, exc)
+
+
+class RedisGeocodeStore:
+    """Geocode answers in Redis, kept for their TTL plus ``GEOCODE_STALE_SECONDS``."""
+
+    name = "redis"
+
+    def __init__(self, client: Any) -> None:
+        self.client = client
+
+    def get(self, key: str) -> StoredAnswer | None:
+        try:
+            raw = self.client.get(f"sq:geocode:{key}")
+        except RedisError as exc:
+            logger.warning("Geocode store read failed for %s: %s", key, exc)
+            return None
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return StoredAnswer(entry["payload"], datetime.fromisoformat(entry["expires_at"]))
+
+    def put(self, key: str, payload: Any, ttl_seconds: float) -> None:
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        raw = json.dumps({"payload": payload, "expires_at": expires_at.isoformat()})
+        try:
+            self.client.set(
+                f"sq:geocode:{key}", raw, px=int((ttl_seconds + Config.GEOCODE_STALE_SECONDS) * 1000)
+            )
+        except RedisError as exc:
+            logger.warning("Geocode store write failed for %s: %s", key, exc)
+
+
+def _build_store() -> PostgresGeocodeStore | RedisGeocodeStore:
+    if Config.GEOCODE_STORE == "redis":
+        client = get_redis()
+        if client is not None:
+            return RedisGeocodeStore(client)
+        logger.warning("GEOCODE_STORE=redis but redis is not installed; using Postgres")
+    return PostgresGeocodeStore()
+
+
+geocode_store = _build_store()
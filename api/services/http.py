@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import Config
+from services.resilience import CircuitBreaker
+
+USER_AGENT = "SideQuest/1.0"
+
+
+@dataclass(frozen=True)
+class UpstreamPolicy:
+    timeout: tuple[float, float]  # (connect, read) seconds
+    retries: int
+    backoff: float
+    slow_call_seconds: float
+    retry_methods: frozenset[str] = frozenset({"GET"})
+
+
+# Overpass queries are read-only, so retrying its POSTs is safe
+POLICIES: dict[str, UpstreamPolicy] = {
+    "open_meteo": UpstreamPolicy(timeout=(3.05, 10), retries=2, backoff=0.3, slow_call_seconds=3),
+    "overpass": UpstreamPolicy(
+        timeout=(3.05, 30), retries=1, backoff=1.0, slow_call_seconds=15, retry_methods=frozenset({"GET", "POST"})
+    ),
+    "nominatim": UpstreamPolicy(timeout=(3.05, 10), retries=1, backoff=1.0, slow_call_seconds=3),
+    "keyn": UpstreamPolicy(timeout=(3.05, 5), retries=2, backoff=0.2, slow_call_seconds=2),
+}
+
+
+class UpstreamClient:
+    """Keep-alive session for one upstream with its own pool, retry, timeout and circuit breaker."""
+
+    def __init__(self, name: str, policy: UpstreamPolicy) -> None:
+        self.name = name
+        self.policy = policy
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(
+            pool_connections=Config.HTTP_POOL_HOSTS,
+            pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+            max_retries=Retry(
+                total=policy.retries,
+                connect=policy.retries,
+                read=policy.retries,
+                status=policy.retries,
+                backoff_factor=policy.backoff,
+                status_forcelist=(429, 502, 503, 504),
+                allowed_methods=policy.retry_methods,
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._adapter = adapter
+        self.breaker = CircuitBreaker(name, policy.slow_call_seconds)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        kwargs.setdefault("timeout", self.policy.timeout)
+        self.breaker.before_call()
+        with self._lock:
+            self.in_flight += 1
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.request(method, url, **kwargs)
+            ok = response.status_code < 500 and response.status_code != 429
+            return response
+        except requests.RequestException:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.breaker.record(ok, elapsed)
+            with self._lock:
+                self.in_flight -= 1
+                self.requests += 1
+                self.total_seconds += elapsed
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> dict[str, Any]:
+        pools = []
+        for key in list(self._adapter.poolmanager.pools.keys()):
+            pool = self._adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            pools.append(
+                {
+                    "host": pool.host,
+                    "connections_opened": pool.num_connections,
+                    "requests": pool.num_requests,
+                    "idle": pool.pool.qsize() if pool.pool is not None else 0,
+                    "maxsize": pool.pool.maxsize if pool.pool is not None else 0,
+                }
+            )
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "avg_ms": round(self.total_seconds / self.requests * 1000, 1) if self.requests else None,
+                "pools": pools,
+                "breaker": self.breaker.stats(),
+            }
+
+
+_clients = {name: UpstreamClient(name, policy) for name, policy in POLICIES.items()}
+
+
+def upstream(name: str) -> UpstreamClient:
+    return _clients[name]
+
+
+def upstream_stats() -> dict[str, Any]:
+    return {name: client.stats() for name, client in _clients.items()}
@@ -0,0 +1,70 @@
+"""
+Process-level username -> user cache for request authentication.
+
+Entries are detached ``User`` snapshots (the session expires nothing on
+commit, so every column stays loaded). Treat them as read-only: handlers
+that write load their own copy with ``session.get``, and those writes
+evict the snapshot here. Other workers' writes show up after the TTL.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.postgresql import insert
+
+from config import Config
+from models import User
+from services.cache import TTLCache
+
+identity_cache = TTLCache(
+    name="identity",
+    max_entries=Config.IDENTITY_CACHE_MAX_ENTRIES,
+    default_ttl=Config.IDENTITY_CACHE_TTL_SECONDS,
+)
+
+
+def cached_user(username: str) -> User | None:
+    return identity_cache.get(username)
+
+
+def remember(user: User) -> User:
+    identity_cache.set(user.username, user)
+    return user
+
+
+def provision_user(session, username: str, **defaults: Any) -> User:
+    """The user named ``username``, created with ``defaults`` if missing, in one round trip.
+
+    ``INSERT ... ON CONFLICT DO UPDATE ... RETURNING`` always returns the row,
+    so concurrent first requests for a new user all succeed without a retry.
+    The no-op update only exists to make RETURNING yield the existing row;
+    ``defaults`` never overwrite it. The row is committed, detached and cached.
+    """
+    defaults.setdefault("display_name", username)
+    defaults.setdefault("prefs", {})
+    defaults.setdefault("quest_preferences", {})
+    statement = insert(User).values(username=username, **defaults)
+    statement = statement.on_conflict_do_update(
+        index_elements=[User.username],
+        set_={"username": statement.excluded.username},
+    ).returning(User)
+    user = session.scalars(statement, execution_options={"populate_existing": True}).one()
+    session.commit()
+    # The cached snapshot is shared across requests, so it must not stay in this session
+    session.expunge(user)
+    return remember(user)
+
+
+def forget(username: str | None) -> None:
+    if username:
+        identity_cache.invalidate(username)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_write(mapper, connection, target: User) -> None:
+    history = inspect(target).attrs.username.history
+    for username in (*history.deleted, target.username):
+        forget(username)
@@ -1,14 +1,20 @@
 from __future__ import annotations
 
+import hashlib
 import logging
+import threading
 import time
 from dataclasses import dataclass
 from typing import Any
 
 import requests
-from jwt import PyJWKClient, decode, exceptions as jwt_exceptions
+from jwt import PyJWK, PyJWKSet, decode, exceptions as jwt_exceptions, get_unverified_header
 
 from config import Config
+from services.cache import TTLCache
+from services.fanout import submit_background
+from services.http import upstream
+from services.singleflight import single_flight
 
 logger = logging.getLogger(__name__)
 
@@ -22,40 +28,109 @@ class KeyNUser:
 
 
 class KeyNClient:
+    """KeyN API client with process-local signing-key and verified-token caches.
+
+    Signing keys are held by ``kid`` and refreshed in the background once
+    ``KEYN_JWKS_REFRESH_SECONDS`` old; only a token naming an unknown ``kid``
+    triggers an immediate (rate-limited) refetch. Verified claims are cached
+    by token hash until the token's ``exp``, so repeat calls from the same
+    session skip signature verification.
+    """
+
     def __init__(self) -> None:
-        self._jwks_client: PyJWKClient | None = None
-        self._jwks_last_fetch = 0.0
-
-    def _get_jwks_client(self) -> PyJWKClient | None:
-        jwks_url = Config.KEYN_JWKS_URL or f"{Config.KEYN_AUTH_SERVER_URL}/.well-known/jwks.json"
-        now = time.time()
-        if self._jwks_client and now - self._jwks_last_fetch < 300:
-            return self._jwks_client
+        self._keys: dict[str, PyJWK] = {}
+        self._keys_fetched_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._claims = TTLCache(name="keyn_tokens", max_entries=Config.KEYN_TOKEN_CACHE_MAX_ENTRIES, default_ttl=0)
+        self.jwks_fetches = 0
+        self.jwks_failures = 0
+
+    @property
+    def _jwks_url(self) -> str:
+        return Config.KEYN_JWKS_URL or f"{Config.KEYN_AUTH_SERVER_URL}/.well-known/jwks.json"
+
+    def _fetch_keys(self) -> dict[str, PyJWK]:
+        def fetch() -> dict[str, PyJWK]:
+            resp = upstream("keyn").get(self._jwks_url)
+            resp.raise_for_status()
+            return {key.key_id: key for key in PyJWKSet.from_dict(resp.json()).keys if key.key_id}
+
         try:
-            self._jwks_client = PyJWKClient(jwks_url)
-            self._jwks_last_fetch = now
-            return self._jwks_client
-        except Exception as exc:  # pragma: no cover - network failure
+            keys = single_flight.do("keyn_jwks", fetch)
+        except (requests.RequestException, ValueError, jwt_exceptions.PyJWTError) as exc:
+            with self._lock:
+                self.jwks_failures += 1
             logger.warning("Failed to fetch KeyN JWKS: %s", exc)
-            return None
+            return self._keys
+        with self._lock:
+            self._keys = keys
+            self._keys_fetched_at = time.monotonic()
+            self.jwks_fetches += 1
+        return keys
+
+    def _schedule_refresh(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh() -> None:
+            try:
+                self._fetch_keys()
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        submit_background(refresh)
+
+    def _signing_key(self, kid: str | None) -> PyJWK | None:
+        age = time.monotonic() - self._keys_fetched_at
+        key = self._keys.get(kid) if kid else None
+        if key is not None:
+            if age >= Config.KEYN_JWKS_REFRESH_SECONDS:
+                self._schedule_refresh()
+            return key
+        # Unknown kid: the provider may have rotated keys. Rate-limited so forged kids cannot hammer KeyN.
+        if not self._keys or age >= Config.KEYN_JWKS_MIN_REFETCH_SECONDS:
+            return self._fetch_keys().get(kid) if kid else None
+        return None
 
     def decode_token(self, token: str) -> dict[str, Any] | None:
-        jwks_client = self._get_jwks_client()
+        cache_key = hashlib.sha256(token.encode()).digest()
+        claims = self._claims.get(cache_key)
+        if claims is not None:
+            return claims
+
         try:
-            if jwks_client:
-                signing_key = jwks_client.get_signing_key_from_jwt(token)
-                return decode(token, signing_key.key, algorithms=["RS256"], audience=Config.KEYN_CLIENT_ID)
-            return decode(token, options={"verify_signature": False, "verify_aud": False})
+            signing_key = self._signing_key(get_unverified_header(token).get("kid"))
+            if signing_key is None:
+                logger.debug("JWT decode failed: no KeyN signing key for token")
+                return None
+            claims = decode(token, signing_key.key, algorithms=["RS256"], audience=Config.KEYN_CLIENT_ID)
         except jwt_exceptions.PyJWTError as exc:
             logger.debug("JWT decode failed: %s", exc)
             return None
 
+        expires_in = claims.get("exp", 0) - time.time()
+        if expires_in > 0:
+            self._claims.set(cache_key, claims, ttl=expires_in)
+        return claims
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            counters = {
+                "signing_keys": len(self._keys),
+                "jwks_fetches": self.jwks_fetches,
+                "jwks_failures": self.jwks_failures,
+            }
+        return {**self._claims.stats(), **counters}
+
     def fetch_user(self, token: str) -> KeyNUser | None:
         try:
-            resp = requests.get(
+            resp = upstream("keyn").get(
                 f"{Config.KEYN_AUTH_SERVER_URL}/oauth/userinfo",
                 headers={"Authorization": f"Bearer {token}"},
-                timeout=5,
             )
             resp.raise_for_status()
         except requests.RequestException as exc:  # pragma: no cover - network failure
@@ -0,0 +1,61 @@
+"""
+Keyset pagination over ``(created_at, id)``, newest first.
+
+A page is "rows strictly older than the last row of the previous page",
+which a composite index on the filter columns plus ``(created_at, id)``
+answers with one index range scan at any depth. The position travels as an
+opaque URL-safe cursor; the id breaks ties between equal timestamps.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Raises ``ValueError`` for anything ``encode_cursor`` did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+def parse_limit(value: str | None) -> int:
+    try:
+        limit = int(value) if value else DEFAULT_LIMIT
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def keyset_page(query: Query, model: Any, cursor: str | None, limit: int) -> tuple[list[Any], str | None]:
+    """One page of ``query`` ordered by ``model.created_at, model.id`` descending.
+
+    Returns ``(rows, next_cursor)``; ``next_cursor`` is ``None`` on the last
+    page. Fetches one extra row to know whether another page exists, so no
+    count is needed.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
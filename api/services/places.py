@@ -0,0 +1,401 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from dataclasses import astuple, dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Iterable
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+from config import Config
+from database import session_scope
+from models import Place, PlaceTile
+from services.geo import KM_PER_DEGREE, k_nearest
+from services.fanout import submit_background
+from services.http import upstream
+from services.singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+OVERPASS_URL = Config.OVERPASS_URL
+
+# Everything quest templates can ask for, fetched in one query per tile so any
+# later type combination is answerable locally.
+OVERPASS_TILE_QUERY = """
+[out:json][timeout:25];
+(
+  nwr["leisure"="park"]({bbox});
+  nwr["amenity"~"^(cafe|restaurant|fast_food|library|marketplace)$"]({bbox});
+  nwr["tourism"~"^(museum|gallery)$"]({bbox});
+  nwr["shop"]({bbox});
+);
+out center tags;
+"""
+
+PLACE_UPSERT_COLUMNS = ("name", "kind", "lat", "lon", "address", "tile", "updated_at")
+
+Tile = tuple[int, int]
+
+
+@dataclass(frozen=True, slots=True)
+class PlaceRecord:
+    osm_id: str
+    name: str | None
+    kind: str
+    lat: float
+    lon: float
+    address: str | None = None
+
+
+@dataclass
+class _TileData:
+    expires_at: float
+    buckets: dict[Tile, list[PlaceRecord]] = field(default_factory=dict)
+
+
+def classify(tags: dict[str, Any]) -> str | None:
+    """Map OSM tags onto the place kinds used by quest templates."""
+    if tags.get("leisure") == "park":
+        return "park"
+    amenity = tags.get("amenity")
+    if amenity in {"cafe", "restaurant", "fast_food", "library"}:
+        return amenity
+    if amenity == "marketplace":
+        return "market"
+    tourism = tags.get("tourism")
+    if tourism in {"museum", "gallery"}:
+        return tourism
+    shop = tags.get("shop")
+    if shop == "supermarket":
+        return "supermarket"
+    if shop:
+        return "shop"
+    return None
+
+
+def parse_overpass_elements(elements: Iterable[dict[str, Any]]) -> list[PlaceRecord]:
+    records = []
+    for element in elements:
+        tags = element.get("tags") or {}
+        kind = classify(tags)
+        if kind is None:
+            continue
+        if element.get("type") == "node":
+            lat, lon = element.get("lat"), element.get("lon")
+        else:
+            center = element.get("center") or {}
+            lat, lon = center.get("lat"), center.get("lon")
+        if lat is None or lon is None:
+            continue
+        records.append(
+            PlaceRecord(
+                osm_id=f"{element.get('type')}/{element.get('id')}",
+                name=tags.get("name"),
+                kind=kind,
+                lat=float(lat),
+                lon=float(lon),
+                address=tags.get("addr:street"),
+            )
+        )
+    return records
+
+
+def tile_of(lat: float, lon: float) -> Tile:
+    size = Config.PLACE_TILE_DEGREES
+    return math.floor(lat / size), math.floor(lon / size)
+
+
+def tile_key(tile: Tile) -> str:
+    return f"{tile[0]}:{tile[1]}"
+
+
+def tile_bbox(tile: Tile) -> tuple[float, float, float, float]:
+    """South, west, north, east bounds of a tile."""
+    size = Config.PLACE_TILE_DEGREES
+    return tile[0] * size, tile[1] * size, (tile[0] + 1) * size, (tile[1] + 1) * size
+
+
+def _radius_degrees(lat: float, radius_km: float) -> tuple[float, float]:
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return dlat, dlon
+
+
+def tiles_within(lat: float, lon: float, radius_km: float) -> list[Tile]:
+    dlat, dlon = _radius_degrees(lat, radius_km)
+    south, west = tile_of(lat - dlat, lon - dlon)
+    north, east = tile_of(lat + dlat, lon + dlon)
+    return [(i, j) for i in range(south, north + 1) for j in range(west, east + 1)]
+
+
+def _bucket_of(lat: float, lon: float) -> Tile:
+    size = Config.PLACE_BUCKET_DEGREES
+    return math.floor(lat / size), math.floor(lon / size)
+
+
+def fetch_tile_from_overpass(tile: Tile) -> list[PlaceRecord]:
+    south, west, north, east = tile_bbox(tile)
+    query = OVERPASS_TILE_QUERY.format(bbox=f"{south},{west},{north},{east}")
+    response = upstream("overpass").post(OVERPASS_URL, data=query)
+    response.raise_for_status()
+    return parse_overpass_elements(response.json().get("elements", []))
+
+
+def store_tiles(records_by_tile: dict[Tile, list[PlaceRecord]], source: str) -> int:
+    """Replace the stored places of each tile and mark the tiles as covered."""
+    now = datetime.utcnow()
+    stored = 0
+    with session_scope() as session:
+        for tile, records in records_by_tile.items():
+            key = tile_key(tile)
+            osm_ids = [record.osm_id for record in records]
+            session.execute(delete(Place).where(Place.tile == key, Place.osm_id.not_in(osm_ids)))
+            if records:
+                stmt = insert(Place)
+                session.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=[Place.osm_id],
+                        set_={col: stmt.excluded[col] for col in PLACE_UPSERT_COLUMNS},
+                    ),
+                    [
+                        {
+                            "osm_id": record.osm_id,
+                            "name": record.name,
+                            "kind": record.kind,
+                            "lat": record.lat,
+                            "lon": record.lon,
+                            "address": record.address,
+                            "tile": key,
+                            "updated_at": now,
+                        }
+                        for record in records
+                    ],
+                )
+            tile_stmt = insert(PlaceTile).values(tile=key, place_count=len(records), source=source, fetched_at=now)
+            session.execute(
+                tile_stmt.on_conflict_do_update(
+                    index_elements=[PlaceTile.tile],
+                    set_={"place_count": len(records), "source": source, "fetched_at": now},
+                )
+            )
+            stored += len(records)
+    return stored
+
+
+class PlaceIndex:
+    """In-memory grid index over the ``places`` table, filled one tile at a time.
+
+    A tile is loaded from the database on first use; only tiles that have never
+    been covered (no ``place_tiles`` row) are fetched from Overpass.
+    """
+
+    def __init__(self) -> None:
+        self._tiles: dict[Tile, _TileData] = {}
+        self._lock = threading.Lock()
+        self._reloading: set[Tile] = set()
+        self.db_loads = 0
+        self.overpass_fetches = 0
+        self.overpass_failures = 0
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        kinds: Iterable[str] | None,
+        radius_km: float,
+        k: int = 10,
+    ) -> list[tuple[float, PlaceRecord]]:
+        """The ``k`` nearest places of ``kinds`` within ``radius_km``, as (distance_km, place)."""
+        wanted = set(kinds) if kinds else None
+        dlat, dlon = _radius_degrees(lat, radius_km)
+        south, west = _bucket_of(lat - dlat, lon - dlon)
+        north, east = _bucket_of(lat + dlat, lon + dlon)
+
+        def candidates() -> Iterable[tuple[float, float, PlaceRecord]]:
+            for tile in tiles_within(lat, lon, radius_km):
+                for bucket, records in self._tile(tile).buckets.items():
+                    if not (south <= bucket[0] <= north and west <= bucket[1] <= east):
+                        continue
+                    for record in records:
+                        if wanted is None or record.kind in wanted:
+                            yield record.lat, record.lon, record
+
+        return k_nearest(lat, lon, candidates(), k, radius_km)
+
+    def prefetch(self, lat: float, lon: float, radius_km: float) -> None:
+        """Load every tile a later ``nearest`` call around this point would touch."""
+        for tile in tiles_within(lat, lon, radius_km):
+            self._tile(tile)
+
+    def invalidate(self, tiles: Iterable[Tile] | None = None) -> None:
+        if tiles is None:
+            self._tiles = {}
+            return
+        for tile in tiles:
+            self._tiles.pop(tile, None)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "tiles_loaded": len(self._tiles),
+            "places_loaded": sum(
+                len(records) for data in list(self._tiles.values()) for records in data.buckets.values()
+            ),
+            "db_loads": self.db_loads,
+            "overpass_fetches": self.overpass_fetches,
+            "overpass_failures": self.overpass_failures,
+        }
+
+    def _tile(self, tile: Tile) -> _TileData:
+        data = self._tiles.get(tile)
+        if data is not None:
+            if data.expires_at <= time.monotonic():
+                # Keep serving the loaded tile while one background reload runs
+                self._schedule_reload(tile)
+            return data
+
+        def load() -> _TileData:
+            loaded = self._tiles.get(tile)
+            if loaded is None:
+                loaded = self._tiles[tile] = self._load(tile)
+            return loaded
+
+        return single_flight.do(f"place_tile:{tile_key(tile)}", load)
+
+    def _schedule_reload(self, tile: Tile) -> None:
+        with self._lock:
+            if tile in self._reloading:
+                return
+            self._reloading.add(tile)
+
+        def reload() -> None:
+            try:
+                self._tiles[tile] = self._load(tile, previous=self._tiles.get(tile))
+            except Exception as exc:
+                logger.warning("Place tile reload failed for %s: %s", tile_key(tile), exc)
+            finally:
+                with self._lock:
+                    self._reloading.discard(tile)
+
+        submit_background(reload)
+
+    def _load(self, tile: Tile, previous: _TileData | None = None) -> _TileData:
+        key = tile_key(tile)
+        with session_scope() as session:
+            covered = session.get(PlaceTile, key) is not None
+            rows = session.execute(select(Place).where(Place.tile == key)).scalars().all() if covered else []
+            records = [
+                PlaceRecord(row.osm_id, row.name, row.kind, row.lat, row.lon, row.address) for row in rows
+            ]
+
+        ttl = Config.PLACE_INDEX_RELOAD_SECONDS
+        if covered:
+            self.db_loads += 1
+        else:
+            try:
+                records = single_flight.do(
+                    f"overpass:{key}",
+                    lambda: self._fetch_and_store(tile),
+                    shared=True,
+                    encode=lambda found: json.dumps([astuple(record) for record in found]),
+                    decode=lambda raw: [PlaceRecord(*row) for row in json.loads(raw)],
+                )
+            except Exception as exc:
+                logger.warning("Overpass tile fetch failed for %s: %s", key, exc)
+                self.overpass_failures += 1
+                retry_at = time.monotonic() + Config.PLACE_TILE_RETRY_SECONDS
+                if previous is not None:
+                    return _TileData(expires_at=retry_at, buckets=previous.buckets)
+                return _TileData(expires_at=retry_at)
+
+        buckets: dict[Tile, list[PlaceRecord]] = defaultdict(list)
+        for record in records:
+            buckets[_bucket_of(record.lat, record.lon)].append(record)
+        return _TileData(expires_at=time.monotonic() + ttl, buckets=dict(buckets))
+
+    def _fetch_and_store(self, tile: Tile) -> list[PlaceRecord]:
+        records = fetch_tile_from_overpass(tile)
+        self.overpass_fetches += 1
+        store_tiles({tile: records}, source="overpass")
+        return records
+
+
+place_index = PlaceIndex()
+
+
+def score_places(
+    nearest: list[tuple[float, PlaceRecord]],
+    radius_km: float,
+    preferred_kinds: Iterable[str] | None = None,
+    recent: Iterable[str] | None = None,
+) -> list[tuple[float, PlaceRecord]]:
+    """Re-rank ``nearest`` best first by distance, type match and novelty.
+
+    Each place scores its distance as a fraction of ``radius_km``, plus
+    ``PLACE_SCORE_TYPE_PENALTY`` if its kind is not in ``preferred_kinds`` and
+    ``PLACE_SCORE_REPEAT_PENALTY`` if its osm_id is in ``recent``. The
+    returned pairs still carry distances, not scores.
+    """
+    preferred = set(preferred_kinds) if preferred_kinds else None
+    seen = set(recent) if recent else ()
+    radius = max(radius_km, 0.001)
+
+    def score(item: tuple[float, PlaceRecord]) -> float:
+        distance, record = item
+        value = distance / radius
+        if preferred is not None and record.kind not in preferred:
+            value += Config.PLACE_SCORE_TYPE_PENALTY
+        if record.osm_id in seen:
+            value += Config.PLACE_SCORE_REPEAT_PENALTY
+        return value
+
+    return sorted(nearest, key=score)
+
+
+def import_overpass_file(path: str, bbox: tuple[float, float, float, float] | None = None) -> tuple[int, int]:
+    """Load an Overpass JSON export (``out center tags``) into the place store.
+
+    Every tile touched by the export is replaced. When ``bbox`` (south, west,
+    north, east) is given, tiles inside it with no places are marked covered
+    too, so they are never fetched live. Returns (places, tiles).
+    """
+    with open(path, encoding="utf-8") as handle:
+        elements = json.load(handle).get("elements", [])
+
+    records_by_tile: dict[Tile, list[PlaceRecord]] = defaultdict(list)
+    if bbox is not None:
+        south, west = tile_of(bbox[0], bbox[1])
+        north, east = tile_of(bbox[2], bbox[3])
+        for i in range(south, north + 1):
+            for j in range(west, east + 1):
+                records_by_tile[(i, j)] = []
+    for record in parse_overpass_elements(elements):
+        records_by_tile[tile_of(record.lat, record.lon)].append(record)
+
+    stored = store_tiles(records_by_tile, source="import")
+    place_index.invalidate(records_by_tile.keys())
+    return stored, len(records_by_tile)
+
+
+def refresh_stale_tiles(max_age_days: int) -> tuple[int, int]:
+    """Re-fetch covered tiles older than ``max_age_days`` from Overpass. Returns (tiles, failures)."""
+    cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+    with session_scope() as session:
+        keys = session.execute(select(PlaceTile.tile).where(PlaceTile.fetched_at < cutoff)).scalars().all()
+
+    refreshed = failures = 0
+    for key in keys:
+        i, j = (int(part) for part in key.split(":"))
+        try:
+            store_tiles({(i, j): fetch_tile_from_overpass((i, j))}, source="overpass")
+            place_index.invalidate([(i, j)])
+            refreshed += 1
+        except Exception as exc:
+            logger.warning("Overpass refresh failed for %s: %s", key, exc)
+            failures += 1
+    return refreshed, failures
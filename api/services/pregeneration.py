@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Any
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from config import Config
+from database import session_scope
+from models import User
+from models.quest import Quest
+from services.activity import activity_tracker
+from services.geo import cell_for, cell_half_diagonal_km, k_nearest
+from services.quest_builder import DEFAULT_WEATHER, fetch_quest_context
+from services.quest_pipeline import QuestJob, QuestPipeline, request_pipeline
+from services.weather import forecast_store, weather_cell
+
+logger = logging.getLogger(__name__)
+
+MAX_PLACES_PER_QUEST = 10
+
+
+def is_valid_timezone(name: object) -> bool:
+    """Whether ``name`` is an IANA timezone name ``ZoneInfo`` can load."""
+    if not isinstance(name, str) or not name:
+        return False
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+    return True
+
+
+def user_timezone(user: User) -> ZoneInfo:
+    """Resolve the IANA timezone stored in ``user.prefs['timezone']``.
+
+    Anything that is not a loadable zone name (including non-string JSON
+    stored before writes were validated) falls back to the default.
+    """
+    name = (user.prefs or {}).get("timezone")
+    if not is_valid_timezone(name):
+        name = Config.DEFAULT_TIMEZONE
+    return ZoneInfo(name)
+
+
+def local_today(user: User, now: datetime | None = None) -> date:
+    """The calendar date in the user's timezone."""
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(user_timezone(user)).date()
+
+
+def target_quest_date(tz: ZoneInfo, now: datetime) -> date:
+    """The quest date a timezone should have ready at ``now``.
+
+    A day's quest becomes due ``QUEST_PREGENERATE_LEAD_HOURS`` before the local
+    delivery hour, so shifting the local clock by that offset yields the date.
+    """
+    shift = timedelta(hours=Config.QUEST_PREGENERATE_LEAD_HOURS - Config.QUEST_DELIVERY_HOUR)
+    return (now.astimezone(tz) + shift).date()
+
+
+def delivery_time_utc(tz: ZoneInfo, quest_date: date) -> datetime:
+    """Naive UTC timestamp of the local delivery hour on ``quest_date``."""
+    local = datetime(quest_date.year, quest_date.month, quest_date.day, Config.QUEST_DELIVERY_HOUR, tzinfo=tz)
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@dataclass
+class PregenerationResult:
+    users_considered: int = 0
+    quests_created: int = 0
+    already_generated: int = 0
+    cells: int = 0
+
+
+def _active_users(session, now: datetime) -> list[User]:
+    """Onboarded users seen within ``QUEST_ACTIVE_USER_DAYS``; everyone else is generated lazily."""
+    # Activity buffered by this process counts too
+    activity_tracker.flush()
+    cutoff = now.astimezone(timezone.utc).replace(tzinfo=None) - timedelta(days=Config.QUEST_ACTIVE_USER_DAYS)
+    return list(
+        session.execute(
+            select(User).where(User.onboarding_completed.is_(True), User.last_active_at >= cutoff)
+        ).scalars()
+    )
+
+
+def _places_for_user(user: User, cell_places: list[dict]) -> list[dict]:
+    points = (
+        (place["lat"], place["lon"], place)
+        for place in cell_places
+        if place.get("lat") is not None and place.get("lon") is not None
+    )
+    nearest = k_nearest(
+        user.default_lat, user.default_lon, points, MAX_PLACES_PER_QUEST, user.location_radius_km or 2.0
+    )
+    return [place for _, place in nearest]
+
+
+class CellContext:
+    """``fetch_context`` stage for the batch: one shared fetch per cell, places narrowed per user."""
+
+    def __init__(self, weather: dict[str, Any], cell_places: list[dict]) -> None:
+        self.weather = weather
+        self.cell_places = cell_places
+
+    def __call__(self, job: QuestJob) -> None:
+        job.weather = self.weather
+        job.places = _places_for_user(job.user, self.cell_places) if job.located else []
+
+
+class CollectRows:
+    """``persist`` stage for the batch: keep the row for one bulk insert per bucket."""
+
+    def __init__(self) -> None:
+        self.rows: list[dict[str, Any]] = []
+
+    def __call__(self, job: QuestJob) -> None:
+        self.rows.append(job.values)
+
+
+# The request path's stages; each cell swaps in its own context and row collector
+batch_pipeline = QuestPipeline("batch", **request_pipeline.stages)
+
+
+def _build_cell_rows(
+    cell: tuple[float, float] | None,
+    users: list[User],
+    quest_date: date,
+    delivered_at: datetime,
+) -> list[dict[str, Any]]:
+    """Fetch weather and places once for ``cell`` and run the batch pipeline for each user."""
+    if cell is None:
+        context = CellContext(dict(DEFAULT_WEATHER), [])
+    else:
+        cell_lat, cell_lon = cell
+        search_radius = max(user.location_radius_km or 2.0 for user in users)
+        search_radius += cell_half_diagonal_km(cell_lat, Config.GEO_CELL_DEGREES)
+
+        # Weather for when the quest is delivered, not for when the batch happens to run
+        started = time.perf_counter()
+        context = CellContext(*fetch_quest_context(cell_lat, cell_lon, search_radius, at=delivered_at))
+        batch_pipeline.timings.record("fetch_cell_context", time.perf_counter() - started)
+
+    collect = CollectRows()
+    pipeline = batch_pipeline.replace(fetch_context=context, persist=collect)
+    for user in users:
+        pipeline.run(QuestJob(user_id=user.id, quest_date=quest_date, delivered_at=delivered_at, user=user))
+    return collect.rows
+
+
+def _bulk_insert(session, rows: list[dict[str, Any]]) -> None:
+    started = time.perf_counter()
+    for start in range(0, len(rows), Config.QUEST_BATCH_SIZE):
+        chunk = rows[start:start + Config.QUEST_BATCH_SIZE]
+        # Lazy generation may have raced us for a user; keep whichever row landed first
+        session.execute(insert(Quest).on_conflict_do_nothing(constraint="uq_user_date"), chunk)
+    batch_pipeline.timings.record("bulk_insert", time.perf_counter() - started)
+
+
+def pregenerate_quests(now: datetime | None = None) -> PregenerationResult:
+    """Generate the upcoming daily quest for every active user that lacks one.
+
+    Users are bucketed by timezone so each bucket gets the quest date that is
+    about to be delivered locally, then by geo cell so weather and places are
+    fetched once per cell. Rows are written with chunked bulk inserts.
+    Safe to run repeatedly (e.g. every 15 minutes from cron).
+    """
+    now = now or datetime.now(timezone.utc)
+    result = PregenerationResult()
+
+    with session_scope() as session:
+        users = _active_users(session, now)
+        result.users_considered = len(users)
+        if not users:
+            return result
+
+        by_timezone: dict[str, list[User]] = defaultdict(list)
+        for user in users:
+            by_timezone[user_timezone(user).key].append(user)
+
+        for tz_name, tz_users in by_timezone.items():
+            tz = ZoneInfo(tz_name)
+            quest_date = target_quest_date(tz, now)
+            delivered_at = delivery_time_utc(tz, quest_date)
+
+            user_ids = [user.id for user in tz_users]
+            existing = set(
+                session.execute(
+                    select(Quest.user_id).where(Quest.date == quest_date, Quest.user_id.in_(user_ids))
+                ).scalars()
+            )
+            result.already_generated += len(existing)
+
+            by_cell: dict[tuple[float, float] | None, list[User]] = defaultdict(list)
+            for user in tz_users:
+                if user.id in existing:
+                    continue
+                if user.default_lat and user.default_lon:
+                    by_cell[cell_for(user.default_lat, user.default_lon, Config.GEO_CELL_DEGREES)].append(user)
+                else:
+                    by_cell[None].append(user)
+
+            # One Open-Meteo call per FORECAST_BATCH_CELLS cells instead of one per cell
+            forecast_store.prefetch(
+                weather_cell(user.default_lat, user.default_lon)
+                for cell_users in by_cell.values()
+                for user in cell_users
+                if user.default_lat and user.default_lon
+            )
+
+            # Generation draws only from per-quest RNG streams, so cells can be built concurrently
+            with ThreadPoolExecutor(max_workers=Config.QUEST_BATCH_WORKERS) as pool:
+                cell_rows = pool.map(
+                    lambda item: _build_cell_rows(item[0], item[1], quest_date, delivered_at),
+                    by_cell.items(),
+                )
+                rows: list[dict[str, Any]] = [row for chunk in cell_rows for row in chunk]
+            result.cells += sum(1 for cell in by_cell if cell is not None)
+
+            if rows:
+                _bulk_insert(session, rows)
+                result.quests_created += len(rows)
+            logger.info("Pre-generated %d quests for %s on %s", len(rows), tz_name, quest_date)
+
+    return result
@@ -0,0 +1,267 @@
+"""
+Quest building blocks shared by the request path and the pre-generation batch.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import random
+from datetime import date, datetime
+from typing import Any, Iterable
+
+from sqlalchemy import select
+
+from models import User
+from models.quest import Quest
+from models.quest_template import QuestTemplate
+from config import Config
+from services.fanout import gather_with_deadline
+from services.places import place_index, score_places
+from services.rendering import compile_template
+from services.templates import template_index
+from services.weather import weather_at
+
+DEFAULT_WEATHER: dict[str, Any] = {"conditions": ["clear"]}
+
+# Requested place type -> place index kinds that satisfy it
+PLACE_TYPE_KINDS = {
+    "park": ["park"],
+    "cafe": ["cafe", "restaurant"],
+    "shop": ["shop", "supermarket"],
+    "restaurant": ["restaurant", "fast_food"],
+}
+
+
+def get_weather_data(lat: float, lon: float, at: datetime | None = None) -> dict[str, Any]:
+    """Weather at ``at`` (default now) from the per-cell Open-Meteo forecast store."""
+    try:
+        current = weather_at(lat, lon, at)
+        
+        # Map weather codes to conditions
+        weather_code = current.get("weather_code", 0)
+        conditions = []
+        
+        if weather_code in [0, 1]:  # Clear/mainly clear
+            conditions.extend(["clear", "sunny"])
+        elif weather_code in [2, 3]:  # Partly/overcast cloudy
+            conditions.extend(["cloudy", "overcast"])
+        elif weather_code in [45, 48]:  # Fog
+            conditions.extend(["fog", "misty"])
+        elif weather_code in range(51, 68):  # Rain variants
+            conditions.extend(["rainy", "wet"])
+        elif weather_code in range(71, 87):  # Snow variants
+            conditions.extend(["snowy", "cold"])
+        elif weather_code in range(95, 100):  # Thunderstorm
+            conditions.extend(["stormy", "dramatic"])
+            
+        return {
+            "temperature": current.get("temperature_2m"),
+            "humidity": current.get("relative_humidity_2m"),
+            "wind_speed": current.get("wind_speed_10m"),
+            "weather_code": weather_code,
+            "conditions": conditions,
+        }
+    except Exception as e:
+        # Return default weather if API fails
+        return {
+            "temperature": None,
+            "humidity": None,
+            "wind_speed": None,
+            "weather_code": 0,
+            "conditions": ["clear"],
+        }
+
+
+def find_nearby_places(
+    lat: float,
+    lon: float,
+    radius_km: float = 2.0,
+    place_types: list[str] = None,
+    recent: Iterable[str] | None = None,
+) -> list[dict]:
+    """Find nearby places from the offline place index (Overpass only for uncovered tiles).
+
+    With ``recent`` (osm ids from the user's last quests) candidates are
+    re-ranked so places the user has just been sent to sink down the list.
+    """
+    if not place_types:
+        place_types = ["park", "cafe", "shop", "restaurant"]
+    
+    kinds = set()
+    for place_type in place_types:
+        kinds.update(PLACE_TYPE_KINDS.get(place_type, [place_type]))
+    
+    try:
+        if recent:
+            nearest = place_index.nearest(lat, lon, kinds, radius_km, k=Config.PLACE_CANDIDATES)
+            nearest = score_places(nearest, radius_km, recent=recent)[:10]
+        else:
+            nearest = place_index.nearest(lat, lon, kinds, radius_km, k=10)
+    except Exception as e:
+        return []
+    
+    return [
+        {
+            "name": place.name or place.kind.replace("_", " ").title(),
+            "lat": place.lat,
+            "lon": place.lon,
+            "type": place.kind,
+            "address": place.address or "",
+            "osm_id": place.osm_id,
+        }
+        for _, place in nearest
+    ]
+
+
+def fetch_quest_context(
+    lat: float,
+    lon: float,
+    radius_km: float,
+    deadline: float | None = None,
+    at: datetime | None = None,
+    recent: Iterable[str] | None = None,
+) -> tuple[dict[str, Any], list[dict]]:
+    """Fetch weather and nearby places concurrently under one overall deadline.
+
+    ``at`` selects the forecast hour (default now) and ``recent`` is passed on
+    to ``find_nearby_places``. A source that misses the
+    deadline falls back to clear weather or no places rather than holding up
+    the quest.
+    """
+    results = gather_with_deadline(
+        {
+            "weather": (lambda: get_weather_data(lat, lon, at), dict(DEFAULT_WEATHER)),
+            "places": (lambda: find_nearby_places(lat, lon, radius_km, recent=recent), []),
+        },
+        Config.QUEST_CONTEXT_DEADLINE_SECONDS if deadline is None else deadline,
+    )
+    return results["weather"], results["places"]
+
+
+def quest_seed(user_key: int | str, quest_date: date) -> str:
+    """Deterministic per-(user, date) seed, stored in ``Quest.seed``."""
+    return hashlib.md5(f"{user_key}-{quest_date.isoformat()}".encode()).hexdigest()[:16]
+
+
+def quest_rng(seed: str) -> random.Random:
+    """A private random stream for one quest.
+
+    Never seed or draw from the module-level ``random`` while generating: it is
+    shared by every thread, so concurrent generations would interleave draws.
+    """
+    return random.Random(int(seed, 16))
+
+
+def select_quest_template(user: User, weather_data: dict, rng: random.Random) -> QuestTemplate | None:
+    """Select appropriate quest template based on user preferences and weather.
+
+    Served from the compiled in-process template index: no DB round trip and
+    a constant-time weighted draw however many templates exist.
+    """
+    index = template_index.get()
+    candidates = index.match(
+        (user.quest_preferences or {}).get("categories", []),
+        weather_data.get("conditions", []),
+    )
+    return index.sample(candidates, rng)
+
+
+def render_quest_values(
+    user: User,
+    quest_date: date,
+    seed: str,
+    template: QuestTemplate | None,
+    weather_data: dict[str, Any],
+    nearby_places: list[dict],
+    delivered_at: datetime | None = None,
+) -> dict[str, Any]:
+    """Build the column values for a user's quest on ``quest_date`` from the selected template.
+
+    Returns a plain dict so the request path can wrap it in ``Quest(**values)``
+    and the batch path can hand many of them to a single bulk insert. The
+    same inputs always yield the same quest.
+    """
+    if not template:
+        # Fallback to simple quest if no templates
+        generated_context = {
+            "title": "Neighborhood Snapshot",
+            "description": "Grab your camera and capture something interesting in your area.",
+            "hints": ["Look for unique details", "Take your time observing"],
+            "location": None,
+            "nearby_places": nearby_places,
+            "template": None,
+            "personalization": {
+                "preferences": user.quest_preferences or {},
+                "privacy": user.privacy,
+            }
+        }
+        template_id = None
+    else:
+        # Build personalized quest from template
+        location_label = user.default_location_name or "your neighborhood"
+
+        # Fill placeholders from the template's compiled text
+        title, description = compile_template(template).render({"location": location_label})
+
+        # Add weather-specific modifications
+        if "sunny" in weather_data.get("conditions", []):
+            if "outdoor" in template.category:
+                description += " Take advantage of the beautiful weather!"
+        elif "rainy" in weather_data.get("conditions", []):
+            if "outdoor" in template.category:
+                description += " Don't let the rain stop you - find covered areas or embrace the atmosphere!"
+
+        generated_context = {
+            "title": title,
+            "description": description,
+            "hints": template.hints,
+            "difficulty": template.difficulty_level,
+            "rarity": template.rarity.value,
+            "estimated_duration": template.estimated_duration_minutes,
+            "category": template.category,
+            "location": {
+                "name": user.default_location_name,
+                "lat": user.default_lat,
+                "lon": user.default_lon,
+                "radius_km": user.location_radius_km,
+            } if user.default_lat and user.default_lon else None,
+            "nearby_places": nearby_places,
+            # Featured place; its osm_id feeds the novelty ranking of later quests
+            "place": nearby_places[0] if nearby_places else None,
+            "template": {
+                "id": template.id,
+                "name": template.name,
+                "category": template.category,
+            },
+            "personalization": {
+                "preferences": user.quest_preferences or {},
+                "privacy": user.privacy,
+            }
+        }
+        template_id = template.id
+
+    return {
+        "user_id": user.id,
+        "date": quest_date,
+        "template_id": template_id,
+        "seed": seed,
+        "generated_context": generated_context,
+        "weather_context": weather_data,
+        "status": "assigned",
+        "delivered_at": delivered_at or datetime.utcnow(),
+    }
+
+
+def recent_place_ids(session, user_id: int) -> set[str]:
+    """OSM ids of the places featured in the user's last ``PLACE_NOVELTY_QUESTS`` quests."""
+    contexts = session.execute(
+        select(Quest.generated_context)
+        .where(Quest.user_id == user_id)
+        .order_by(Quest.date.desc())
+        .limit(Config.PLACE_NOVELTY_QUESTS)
+    ).scalars()
+    return {
+        context["place"]["osm_id"]
+        for context in contexts
+        if isinstance(context, dict) and isinstance(context.get("place"), dict) and context["place"].get("osm_id")
+    }
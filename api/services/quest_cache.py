@@ -0,0 +1,139 @@
+"""
+Per-(user, date) cache of the serialized ``/api/today`` response.
+
+A daily quest only changes when its status does, so the body is serialized
+once and revalidated with a strong ETag built from quest id and status.
+
+Each worker caches its own copy, so entries carry the per-(user, date)
+version kept in Redis. Any commit that changes a quest's status bumps that
+version, which makes the other workers' copies misses. Without Redis, each
+hit is checked against the row's current status instead.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import date
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from config import Config
+from database import request_scope
+from models.quest import Quest
+from services.cache import TTLCache
+from services.redis_client import RedisError, get_redis
+
+logger = logging.getLogger(__name__)
+
+VERSION_PREFIX = "sq:today:"
+# A version only matters while its quest date can still be served as "today"
+VERSION_TTL_SECONDS = 2 * 24 * 3600
+# Session.info key collecting the quests whose status changed in the open transaction
+_CHANGED = "quest_cache_changed"
+
+quest_response_cache = TTLCache(
+    name="today",
+    max_entries=Config.TODAY_CACHE_MAX_ENTRIES,
+    default_ttl=Config.TODAY_CACHE_TTL_SECONDS,
+)
+
+
+def _etag(quest_id: int, status: str) -> str:
+    return f"q{quest_id}-{status}"
+
+
+def quest_etag(quest: Quest) -> str:
+    """Unquoted strong ETag; set it with ``Response.set_etag``."""
+    return _etag(quest.id, quest.status)
+
+
+def _version_key(user_id: int, quest_date: date) -> str:
+    return f"{VERSION_PREFIX}{user_id}:{quest_date.isoformat()}"
+
+
+def current_version(user_id: int, quest_date: date) -> int | None:
+    """Shared version of the user's quest on ``quest_date``; ``None`` when Redis is unavailable.
+
+    Read it before loading the quest and pass it to ``store``, so a change
+    committed in between leaves the new entry already outdated.
+    """
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return int(client.get(_version_key(user_id, quest_date)) or 0)
+    except RedisError as exc:
+        logger.warning("Could not read quest cache version for user %s: %s", user_id, exc)
+        return None
+
+
+def _stored_etag(user_id: int, quest_date: date) -> str | None:
+    with request_scope() as session:
+        row = session.execute(
+            select(Quest.id, Quest.status).where(Quest.user_id == user_id, Quest.date == quest_date)
+        ).first()
+    return _etag(row.id, row.status) if row is not None else None
+
+
+def get_cached(user_id: int, quest_date: date, version: int | None) -> tuple[str, bytes] | None:
+    """``(etag, body)`` for the user's quest on ``quest_date`` if cached and still current."""
+    entry = quest_response_cache.get((user_id, quest_date))
+    if entry is None:
+        return None
+    cached_version, etag, body = entry
+    if version is None:
+        if etag != _stored_etag(user_id, quest_date):
+            quest_response_cache.invalidate((user_id, quest_date))
+            return None
+    elif cached_version != version:
+        return None
+    return etag, body
+
+
+def store(quest: Quest, body: bytes, version: int | None) -> str:
+    etag = quest_etag(quest)
+    quest_response_cache.set((quest.user_id, quest.date), (version, etag, body))
+    return etag
+
+
+def invalidate(user_id: int, quest_date: date) -> None:
+    """Drop this worker's entry and bump the shared version so every other worker drops theirs."""
+    quest_response_cache.invalidate((user_id, quest_date))
+    client = get_redis()
+    if client is None:
+        return
+    key = _version_key(user_id, quest_date)
+    try:
+        client.pipeline().incr(key).expire(key, VERSION_TTL_SECONDS).execute()
+    except RedisError as exc:
+        logger.warning("Could not bump quest cache version for user %s: %s", user_id, exc)
+
+
+def _note_change(target: Quest) -> None:
+    session = inspect(target).session
+    if session is not None:
+        session.info.setdefault(_CHANGED, set()).add((target.user_id, target.date))
+
+
+@event.listens_for(Quest, "after_update")
+def _note_status_change(mapper, connection, target: Quest) -> None:
+    if inspect(target).attrs.status.history.has_changes():
+        _note_change(target)
+
+
+@event.listens_for(Quest, "after_delete")
+def _note_delete(mapper, connection, target: Quest) -> None:
+    _note_change(target)
+
+
+# Flushes happen before commit; invalidating then would let a concurrent poll re-cache the old row
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    for user_id, quest_date in session.info.pop(_CHANGED, ()):
+        invalidate(user_id, quest_date)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session) -> None:
+    session.info.pop(_CHANGED, None)
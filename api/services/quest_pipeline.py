@@ -0,0 +1,222 @@
+"""
+The quest generation engine: one fixed sequence of named stages.
+
+    load_user -> resolve_location -> fetch_context -> select_template -> render -> persist
+
+Each stage is a callable taking the ``QuestJob`` being built and filling in
+its part. A pipeline is a mapping from stage name to implementation, so the
+request path, the pre-generation batch and scripts share the same engine and
+only swap the stages that differ (e.g. per-cell context, bulk persistence).
+Every stage run is timed; totals per pipeline are exposed on
+``/api/health/metrics``.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Callable
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from models import User
+from models.quest import Quest
+from models.quest_template import QuestTemplate
+from services.quest_builder import (
+    DEFAULT_WEATHER,
+    fetch_quest_context,
+    quest_rng,
+    quest_seed,
+    recent_place_ids,
+    render_quest_values,
+    select_quest_template,
+)
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("load_user", "resolve_location", "fetch_context", "select_template", "render", "persist")
+
+
+@dataclass
+class QuestJob:
+    """One quest being generated; each stage reads earlier fields and fills its own."""
+
+    user_id: int | None
+    quest_date: date
+    session: Any = None
+    delivered_at: datetime | None = None
+    # load_user
+    user: User | None = None
+    # resolve_location
+    lat: float | None = None
+    lon: float | None = None
+    radius_km: float = 2.0
+    # fetch_context
+    weather: dict[str, Any] = field(default_factory=lambda: dict(DEFAULT_WEATHER))
+    places: list[dict] = field(default_factory=list)
+    # select_template
+    seed: str | None = None
+    template: QuestTemplate | None = None
+    # render
+    values: dict[str, Any] | None = None
+    # persist
+    quest: Quest | None = None
+    timings: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def located(self) -> bool:
+        return self.lat is not None and self.lon is not None
+
+
+Stage = Callable[[QuestJob], None]
+
+
+class StageTimings:
+    """Thread-safe count / total / max seconds per stage name."""
+
+    def __init__(self) -> None:
+        self._totals: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            totals = self._totals.setdefault(stage, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] = max(totals[2], seconds)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                stage: {
+                    "runs": count,
+                    "mean_ms": round(total / count * 1000, 3) if count else None,
+                    "max_ms": round(longest * 1000, 3),
+                }
+                for stage, (count, total, longest) in self._totals.items()
+            }
+
+
+_timings: dict[str, StageTimings] = {}
+
+
+class QuestPipeline:
+    def __init__(self, name: str, timings: StageTimings | None = None, **stages: Stage) -> None:
+        missing = [stage for stage in STAGES if stage not in stages]
+        unknown = [stage for stage in stages if stage not in STAGES]
+        if missing or unknown:
+            raise ValueError(f"pipeline {name!r}: missing stages {missing}, unknown stages {unknown}")
+        self.name = name
+        self.stages = {stage: stages[stage] for stage in STAGES}
+        self.timings = timings or _timings.setdefault(name, StageTimings())
+
+    def replace(self, **stages: Stage) -> QuestPipeline:
+        """A copy with some stages swapped; timings still accrue under this pipeline's name."""
+        return QuestPipeline(self.name, self.timings, **{**self.stages, **stages})
+
+    def run(self, job: QuestJob) -> QuestJob:
+        for name, stage in self.stages.items():
+            started = time.perf_counter()
+            try:
+                stage(job)
+            finally:
+                elapsed = time.perf_counter() - started
+                job.timings[name] = elapsed
+                self.timings.record(name, elapsed)
+        logger.debug("%s pipeline for user %s: %s", self.name, job.user_id, job.timings)
+        return job
+
+
+def pipeline_stats() -> dict[str, Any]:
+    return {name: timings.stats() for name, timings in _timings.items()}
+
+
+# --- stage implementations -------------------------------------------------
+
+
+def load_user(job: QuestJob) -> None:
+    """Use the caller's user if given, else read it through ``job.session``."""
+    if job.user is None:
+        job.user = job.session.get(User, job.user_id)
+        if job.user is None:
+            raise LookupError(f"user {job.user_id} does not exist")
+    job.user_id = job.user.id
+
+
+def resolve_home_location(job: QuestJob) -> None:
+    """The user's saved default location, if any."""
+    user = job.user
+    job.radius_km = user.location_radius_km or 2.0
+    if user.default_lat and user.default_lon:
+        job.lat, job.lon = user.default_lat, user.default_lon
+
+
+class FallbackLocation:
+    """The user's saved location, or a fixed point for users without one."""
+
+    def __init__(self, lat: float, lon: float) -> None:
+        self.lat = lat
+        self.lon = lon
+
+    def __call__(self, job: QuestJob) -> None:
+        resolve_home_location(job)
+        if not job.located:
+            job.lat, job.lon = self.lat, self.lon
+
+
+def fetch_live_context(job: QuestJob) -> None:
+    """Weather for the delivery hour and nearby places, ranked against the user's recent quests."""
+    if not job.located:
+        return
+    recent = recent_place_ids(job.session, job.user_id) if job.session is not None else None
+    job.weather, job.places = fetch_quest_context(
+        job.lat, job.lon, job.radius_km, at=job.delivered_at, recent=recent
+    )
+
+
+def select_weighted_template(job: QuestJob) -> None:
+    """Weighted draw from the compiled template index, seeded per (user, date)."""
+    job.seed = quest_seed(job.user.username, job.quest_date)
+    job.template = select_quest_template(job.user, job.weather, quest_rng(job.seed))
+
+
+def render_quest(job: QuestJob) -> None:
+    job.values = render_quest_values(
+        job.user, job.quest_date, job.seed, job.template, job.weather, job.places, job.delivered_at
+    )
+
+
+def insert_quest(job: QuestJob) -> None:
+    """Insert the quest through ``job.session``, or load the row that won the race for it.
+
+    The batch and concurrent requests insert with the same ``ON CONFLICT DO
+    NOTHING``, so whoever lands first owns the (user, date) quest. The
+    caller's session commits.
+    """
+    statement = (
+        insert(Quest)
+        .values(**job.values)
+        .on_conflict_do_nothing(constraint="uq_user_date")
+        .returning(Quest)
+    )
+    quest = job.session.scalars(statement).one_or_none()
+    if quest is None:
+        quest = job.session.execute(
+            select(Quest).where(Quest.user_id == job.values["user_id"], Quest.date == job.values["date"])
+        ).scalar_one()
+    job.quest = quest
+
+
+request_pipeline = QuestPipeline(
+    "request",
+    load_user=load_user,
+    resolve_location=resolve_home_location,
+    fetch_context=fetch_live_context,
+    select_template=select_weighted_template,
+    render=render_quest,
+    persist=insert_quest,
+)
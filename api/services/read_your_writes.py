@@ -0,0 +1,48 @@
+"""
+Which users wrote recently, so their reads skip the replica until it has caught up.
+
+Marks live in this process and, when Redis is reachable, in Redis too, so a
+write handled by one worker also pins the user's reads in the others.
+"""
+
+from __future__ import annotations
+
+import logging
+
+from config import Config
+from services.cache import TTLCache
+from services.redis_client import RedisError, get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "sq:wrote:"
+
+recent_writers = TTLCache(
+    name="recent_writers",
+    max_entries=100_000,
+    default_ttl=Config.REPLICA_READ_YOUR_WRITES_SECONDS,
+)
+
+
+def mark_writer(user_id: int) -> None:
+    recent_writers.set(user_id, True)
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.set(f"{KEY_PREFIX}{user_id}", 1, px=Config.REPLICA_READ_YOUR_WRITES_SECONDS * 1000)
+    except RedisError as exc:
+        logger.warning("Could not share write mark for user %s: %s", user_id, exc)
+
+
+def wrote_recently(user_id: int) -> bool:
+    if recent_writers.get(user_id):
+        return True
+    client = get_redis()
+    if client is None:
+        return False
+    try:
+        return bool(client.exists(f"{KEY_PREFIX}{user_id}"))
+    except RedisError:
+        # Unknown: the primary is always consistent
+        return True
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any
+
+from config import Config
+
+try:
+    import redis
+    from redis import RedisError
+except ImportError:  # installed with celery[redis]; absent in bare environments
+    redis = None
+
+    class RedisError(Exception):
+        """Stand-in so callers can catch Redis failures without importing redis."""
+
+
+logger = logging.getLogger(__name__)
+
+_client: Any = None
+_lock = threading.Lock()
+
+
+def get_redis() -> Any:
+    """Shared Redis client built from ``REDIS_URL``, or ``None`` when redis is unavailable."""
+    global _client
+    if redis is None or not Config.REDIS_URL:
+        return None
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = redis.Redis.from_url(
+                    Config.REDIS_URL,
+                    socket_connect_timeout=Config.REDIS_SOCKET_TIMEOUT_SECONDS,
+                    socket_timeout=Config.REDIS_SOCKET_TIMEOUT_SECONDS,
+                )
+                logger.info("Connected shared cache tier at %s", Config.REDIS_URL)
+    return _client
@@ -0,0 +1,142 @@
+"""
+Compiled quest text: placeholders are parsed once per template version, then
+every render is a single join over pre-split segments.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Mapping
+
+from models.quest_template import QuestTemplate
+
+PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, dict):
+        return str(value.get("name", value))
+    return str(value)
+
+
+class CompiledText:
+    """A string split into literal segments and ``{name}`` placeholders.
+
+    Placeholders missing from the render context are left as written, which
+    matches the ``str.replace`` rendering this replaces.
+    """
+
+    __slots__ = ("source", "_parts")
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        parts: list[tuple[bool, str]] = []
+        position = 0
+        for match in PLACEHOLDER.finditer(source):
+            if match.start() > position:
+                parts.append((False, source[position : match.start()]))
+            parts.append((True, match.group(1)))
+            position = match.end()
+        if position < len(source):
+            parts.append((False, source[position:]))
+        self._parts = tuple(parts)
+
+    @property
+    def placeholders(self) -> frozenset[str]:
+        return frozenset(text for is_placeholder, text in self._parts if is_placeholder)
+
+    def render(self, context: Mapping[str, Any]) -> str:
+        if len(self._parts) == 1 and not self._parts[0][0]:
+            return self.source
+        out = []
+        for is_placeholder, text in self._parts:
+            if not is_placeholder:
+                out.append(text)
+            elif text in context:
+                out.append(_format_value(context[text]))
+            else:
+                out.append("{" + text + "}")
+        return "".join(out)
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledTemplate:
+    """Session-free snapshot of a quest template with its text pre-parsed."""
+
+    id: int
+    version: datetime
+    name: str
+    title: CompiledText
+    description: CompiledText
+    hints: tuple[str, ...]
+    rarity: str
+    category: str
+    difficulty: int
+    estimated_duration: int | None
+    weather_conditions: tuple[str, ...]
+    location_types: tuple[str, ...]
+
+    @property
+    def requires_place(self) -> bool:
+        return bool(self.location_types)
+
+    def render(self, context: Mapping[str, Any]) -> tuple[str, str]:
+        """(title, description) with placeholders filled from ``context``."""
+        return self.title.render(context), self.description.render(context)
+
+    def summary(self) -> dict[str, Any]:
+        """Shape returned by ``GET /api/quests/templates``."""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "title": self.title.source,
+            "description": self.description.source,
+            "rarity": self.rarity,
+            "category": self.category,
+            "difficulty": self.difficulty,
+            "estimated_duration": self.estimated_duration,
+            "weather_conditions": list(self.weather_conditions),
+            "location_types": list(self.location_types),
+        }
+
+
+_compiled: dict[int, CompiledTemplate] = {}
+_lock = threading.Lock()
+
+
+def compile_template(template: QuestTemplate) -> CompiledTemplate:
+    """Compiled form of ``template``, reused while its id and ``updated_at`` are unchanged."""
+    cached = _compiled.get(template.id)
+    if cached is not None and cached.version == template.updated_at:
+        return cached
+    compiled = CompiledTemplate(
+        id=template.id,
+        version=template.updated_at,
+        name=template.name,
+        title=CompiledText(template.title),
+        description=CompiledText(template.description),
+        hints=tuple(template.hints or ()),
+        rarity=template.rarity.value if hasattr(template.rarity, "value") else str(template.rarity),
+        category=template.category,
+        difficulty=template.difficulty_level,
+        estimated_duration=template.estimated_duration_minutes,
+        weather_conditions=tuple(template.weather_conditions or ()),
+        location_types=tuple(template.location_types or ()),
+    )
+    with _lock:
+        _compiled[template.id] = compiled
+    return compiled
+
+
+def cached_template(template_id: int) -> CompiledTemplate | None:
+    """Last compiled version of a template, including ones no longer active."""
+    return _compiled.get(template_id)
+
+
+def forget_template(template_id: int | None) -> None:
+    if template_id is not None:
+        with _lock:
+            _compiled.pop(template_id, None)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Hashable
+
+import requests
+
+from config import Config
+from services.cache import TTLCache
+from services.fanout import submit_background
+from services.singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+class CircuitBreaker:
+    """Per-upstream breaker that trips on error rate or slow-call rate.
+
+    Outcomes of the last ``BREAKER_WINDOW`` calls are kept. Once at least
+    ``BREAKER_MIN_CALLS`` are recorded and either rate reaches
+    ``BREAKER_FAILURE_RATE`` the breaker opens and calls fail fast for
+    ``BREAKER_COOLDOWN_SECONDS``. After that a single probe call is let
+    through (half-open): success closes the breaker, failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, slow_call_seconds: float) -> None:
+        self.name = name
+        self.slow_call_seconds = slow_call_seconds
+        self.state = self.CLOSED
+        self._outcomes: deque[tuple[bool, bool]] = deque(maxlen=Config.BREAKER_WINDOW)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.trips = 0
+        self.rejected = 0
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < Config.BREAKER_COOLDOWN_SECONDS:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"{self.name} circuit is open")
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"{self.name} circuit is half-open")
+                self._probe_in_flight = True
+
+    def record(self, ok: bool, seconds: float) -> None:
+        slow = seconds >= self.slow_call_seconds
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+                if ok and not slow:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._trip()
+                return
+
+            self._outcomes.append((not ok, slow))
+            if self.state != self.CLOSED or len(self._outcomes) < Config.BREAKER_MIN_CALLS:
+                return
+            failures = sum(1 for failed, _ in self._outcomes if failed)
+            slow_calls = sum(1 for _, was_slow in self._outcomes if was_slow)
+            threshold = Config.BREAKER_FAILURE_RATE * len(self._outcomes)
+            if failures >= threshold or slow_calls >= threshold:
+                self._trip()
+
+    def _trip(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.trips += 1
+        logger.warning("Circuit for %s opened (trip #%d)", self.name, self.trips)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "window_calls": len(self._outcomes),
+                "window_failures": sum(1 for failed, _ in self._outcomes if failed),
+            }
+
+
+_refreshing: set[tuple[int, Hashable]] = set()
+_refreshing_lock = threading.Lock()
+
+
+def _flight_key(cache: TTLCache, key: Hashable) -> str:
+    return f"{cache.name}:{key!r}"
+
+
+def _refresh(
+    cache: TTLCache, key: Hashable, fetch: Callable[[], Any], ttl: Callable[[Any], float], stale_ttl: float
+) -> None:
+    try:
+        value = single_flight.do(_flight_key(cache, key), fetch, shared=True)
+        cache.set(key, value, ttl=ttl(value), stale_ttl=stale_ttl)
+    except Exception as exc:
+        logger.info("Background refresh of %r failed; keeping stale value: %s", key, exc)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard((id(cache), key))
+
+
+def get_or_revalidate(
+    cache: TTLCache,
+    key: Hashable,
+    fetch: Callable[[], Any],
+    ttl: Callable[[Any], float],
+    stale_ttl: float,
+) -> Any:
+    """Stale-while-revalidate read through ``cache``.
+
+    ``ttl`` maps a fetched value to its freshness in seconds, so empty
+    answers can be kept for less time. Fresh values are returned as is. A stale value is returned immediately
+    while one background refresh per key runs; with the upstream breaker
+    open that refresh fails fast and the stale value keeps being served.
+    Only a miss calls ``fetch`` inline, so its exceptions reach the caller.
+    Concurrent misses and refreshes for one key share a single ``fetch``
+    (see ``SingleFlight``), so ``fetch`` must return JSON-serializable data.
+    """
+    found = cache.lookup(key)
+    if found is not None:
+        value, fresh = found
+        if not fresh:
+            token = (id(cache), key)
+            with _refreshing_lock:
+                start = token not in _refreshing
+                _refreshing.add(token)
+            if start:
+                submit_background(lambda: _refresh(cache, key, fetch, ttl, stale_ttl))
+        return value
+
+    value = single_flight.do(_flight_key(cache, key), fetch, shared=True)
+    cache.set(key, value, ttl=ttl(value), stale_ttl=stale_ttl)
+    return value
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable
+
+from config import Config
+from services.redis_client import RedisError, get_redis
+
+logger = logging.getLogger(__name__)
+
+# Compare-and-delete so a leader never releases a lock that expired and was re-taken
+_RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one in-flight call.
+
+    The first caller for a key (the leader) runs ``fn``; callers arriving
+    while it runs wait and receive the same result or exception. Nothing is
+    remembered once the call finishes, so this sits in front of a cache miss
+    rather than replacing the cache.
+
+    With ``shared=True`` and ``SINGLE_FLIGHT_SHARED`` enabled the leader also
+    takes a lock in Redis, so leaders in other worker processes wait for its
+    encoded result instead of calling the upstream too. Any Redis failure,
+    or a lock holder that does not publish within ``SINGLE_FLIGHT_WAIT_SECONDS``,
+    falls back to calling ``fn`` locally.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.shared_waits = 0
+        self.shared_fallbacks = 0
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[[], Any],
+        shared: bool = False,
+        encode: Callable[[Any], str] = json.dumps,
+        decode: Callable[[str | bytes], Any] = json.loads,
+    ) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            if shared and Config.SINGLE_FLIGHT_SHARED:
+                call.value = self._do_shared(key, fn, encode, decode)
+            else:
+                call.value = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.value
+
+    def _do_shared(
+        self,
+        key: str,
+        fn: Callable[[], Any],
+        encode: Callable[[Any], str],
+        decode: Callable[[str | bytes], Any],
+    ) -> Any:
+        client = get_redis()
+        if client is None:
+            return fn()
+        lock_key = f"sq:flight:{key}"
+        result_key = f"{lock_key}:result"
+        token = uuid.uuid4().hex
+
+        try:
+            acquired = client.set(lock_key, token, nx=True, px=int(Config.SINGLE_FLIGHT_LOCK_SECONDS * 1000))
+            if acquired:
+                client.delete(result_key)
+        except RedisError as exc:
+            logger.info("Shared single-flight unavailable for %s: %s", key, exc)
+            return fn()
+
+        if acquired:
+            try:
+                value = fn()
+                try:
+                    client.set(result_key, encode(value), px=int(Config.SINGLE_FLIGHT_RESULT_SECONDS * 1000))
+                except RedisError as exc:
+                    logger.info("Could not publish single-flight result for %s: %s", key, exc)
+                return value
+            finally:
+                try:
+                    client.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+                except RedisError:
+                    pass  # the lock expires on its own
+
+        deadline = time.monotonic() + Config.SINGLE_FLIGHT_WAIT_SECONDS
+        try:
+            while time.monotonic() < deadline:
+                raw = client.get(result_key)
+                if raw is not None:
+                    with self._lock:
+                        self.shared_waits += 1
+                    return decode(raw)
+                if not client.exists(lock_key):
+                    # The holder finished without publishing (it failed); try ourselves
+                    break
+                time.sleep(Config.SINGLE_FLIGHT_POLL_SECONDS)
+        except RedisError as exc:
+            logger.info("Lost shared single-flight for %s: %s", key, exc)
+        with self._lock:
+            self.shared_fallbacks += 1
+        return fn()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "shared_waits": self.shared_waits,
+                "shared_fallbacks": self.shared_fallbacks,
+            }
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from typing import Iterable
+
+from sqlalchemy import event
+
+from config import Config
+from database import session_scope
+from models.quest_template import QuestRarity, QuestTemplate
+from services.rendering import CompiledTemplate, cached_template, compile_template, forget_template
+
+RARITY_WEIGHTS = {
+    QuestRarity.COMMON: 100,
+    QuestRarity.RARE: 30,
+    QuestRarity.LEGENDARY: 5,
+}
+
+
+def _bits(mask: int) -> list[int]:
+    indices = []
+    while mask:
+        low = mask & -mask
+        indices.append(low.bit_length() - 1)
+        mask ^= low
+    return indices
+
+
+class AliasTable:
+    """Walker/Vose alias table: O(n) to build, O(1) per weighted draw."""
+
+    __slots__ = ("indices", "prob", "alias")
+
+    def __init__(self, indices: list[int], weights: list[int]) -> None:
+        n = len(indices)
+        total = sum(weights)
+        scaled = [weight * n / total for weight in weights]
+        self.indices = indices
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+
+    def sample(self, rng: random.Random) -> int:
+        u = rng.random() * len(self.indices)
+        column = int(u)
+        if u - column < self.prob[column]:
+            return self.indices[column]
+        return self.indices[self.alias[column]]
+
+
+class CompiledTemplateIndex:
+    """Immutable selection index over the active templates.
+
+    Each category and weather condition maps to a bitset of template
+    positions, so filtering is a handful of integer ORs/ANDs. Alias tables
+    are built once per distinct candidate bitset and reused afterwards.
+    Each template's text is compiled alongside (``rendered``, ``by_id``).
+    """
+
+    def __init__(self, templates: Iterable[QuestTemplate]) -> None:
+        self.templates = list(templates)
+        self.rendered = [compile_template(template) for template in self.templates]
+        self.by_id = {compiled.id: compiled for compiled in self.rendered}
+        self.category_masks: dict[str, int] = {}
+        self.condition_masks: dict[str, int] = {}
+        self.any_weather_mask = 0
+        self.weights = []
+
+        for position, template in enumerate(self.templates):
+            bit = 1 << position
+            self.category_masks[template.category] = self.category_masks.get(template.category, 0) | bit
+            if not template.weather_conditions:
+                self.any_weather_mask |= bit
+            for condition in template.weather_conditions:
+                self.condition_masks[condition] = self.condition_masks.get(condition, 0) | bit
+            self.weights.append(template.weight * RARITY_WEIGHTS.get(template.rarity, 100) // 10)
+
+        self.all_mask = (1 << len(self.templates)) - 1
+        self._alias_tables: dict[int, AliasTable | None] = {}
+        self._alias_table(self.all_mask)
+
+    def match(self, categories: Iterable[str], conditions: Iterable[str]) -> int:
+        """Candidate bitset: preferred categories, then weather; each filter is skipped if it empties the set."""
+        mask = self.all_mask
+        category_mask = 0
+        for category in categories:
+            category_mask |= self.category_masks.get(category, 0)
+        if category_mask:
+            mask = category_mask
+
+        weather_mask = self.any_weather_mask
+        for condition in conditions:
+            weather_mask |= self.condition_masks.get(condition, 0)
+        if mask & weather_mask:
+            mask &= weather_mask
+        return mask
+
+    def sample(self, mask: int, rng: random.Random) -> QuestTemplate | None:
+        if not mask:
+            return None
+        table = self._alias_table(mask)
+        if table is None:
+            # Every candidate has zero weight; fall back to the first one
+            return self.templates[(mask & -mask).bit_length() - 1]
+        return self.templates[table.sample(rng)]
+
+    def _alias_table(self, mask: int) -> AliasTable | None:
+        try:
+            return self._alias_tables[mask]
+        except KeyError:
+            pass
+        indices = [i for i in _bits(mask) if self.weights[i] > 0]
+        table = AliasTable(indices, [self.weights[i] for i in indices]) if indices else None
+        self._alias_tables[mask] = table
+        return table
+
+
+class TemplateIndex:
+    """Process-wide holder that compiles the active templates on demand.
+
+    Rebuilt after ``invalidate()`` (fired by ORM writes in this process) or
+    after ``TEMPLATE_INDEX_TTL_SECONDS`` so edits made by other workers or the
+    seed script are picked up too.
+    """
+
+    def __init__(self) -> None:
+        self._compiled: CompiledTemplateIndex | None = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> CompiledTemplateIndex:
+        compiled = self._compiled
+        if compiled is not None and time.monotonic() - self._built_at < Config.TEMPLATE_INDEX_TTL_SECONDS:
+            return compiled
+        with self._lock:
+            if self._compiled is not compiled and self._compiled is not None:
+                return self._compiled
+            with session_scope() as session:
+                templates = session.query(QuestTemplate).filter(QuestTemplate.active == True).all()
+            self._compiled = CompiledTemplateIndex(templates)
+            self._built_at = time.monotonic()
+            return self._compiled
+
+    def invalidate(self) -> None:
+        self._compiled = None
+
+    def compiled_template(self, template_id: int | None) -> CompiledTemplate | None:
+        """Compiled template by id, from the index; inactive templates cost one DB read, then stay cached."""
+        if template_id is None:
+            return None
+        compiled = self.get().by_id.get(template_id) or cached_template(template_id)
+        if compiled is not None:
+            return compiled
+        with session_scope() as session:
+            template = session.get(QuestTemplate, template_id)
+            return compile_template(template) if template is not None else None
+
+
+template_index = TemplateIndex()
+
+
+@event.listens_for(QuestTemplate, "after_insert")
+@event.listens_for(QuestTemplate, "after_update")
+@event.listens_for(QuestTemplate, "after_delete")
+def _invalidate_template_index(mapper, connection, target) -> None:
+    template_index.invalidate()
+    forget_template(target.id)
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Iterable
+
+from config import Config
+from services.cache import TTLCache
+from services.fanout import submit_background
+from services.geo import cell_for
+from services.http import upstream
+from services.singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+OPEN_METEO_URL = Config.OPEN_METEO_URL
+HOURLY_FIELDS = ("temperature_2m", "relative_humidity_2m", "weather_code", "wind_speed_10m")
+HOUR = 3600
+
+Cell = tuple[float, float]
+
+
+def weather_cell(lat: float, lon: float) -> Cell:
+    return cell_for(lat, lon, Config.WEATHER_CELL_DEGREES)
+
+
+class CellForecast:
+    """Hourly forecast for one cell held in typed arrays (~14 bytes per hour).
+
+    ``start`` is the UTC epoch second of the first hour; hour ``i`` covers
+    ``[start + i*3600, start + (i+1)*3600)``.
+    """
+
+    __slots__ = ("start", "temperature", "humidity", "weather_code", "wind_speed")
+
+    def __init__(
+        self,
+        start: int,
+        temperature: Iterable[float | None],
+        humidity: Iterable[float | None],
+        weather_code: Iterable[int | None],
+        wind_speed: Iterable[float | None],
+    ) -> None:
+        self.start = start
+        # Open-Meteo pads missing hours with null; NaN / 0 keep the arrays dense
+        self.temperature = array("f", (float("nan") if v is None else v for v in temperature))
+        self.humidity = array("f", (float("nan") if v is None else v for v in humidity))
+        self.weather_code = array("H", (0 if v is None else int(v) for v in weather_code))
+        self.wind_speed = array("f", (float("nan") if v is None else v for v in wind_speed))
+
+    @classmethod
+    def from_response(cls, data: dict[str, Any]) -> CellForecast:
+        hourly = data.get("hourly") or {}
+        times = hourly.get("time") or []
+        return cls(
+            start=int(times[0]) if times else 0,
+            temperature=hourly.get("temperature_2m", []),
+            humidity=hourly.get("relative_humidity_2m", []),
+            weather_code=hourly.get("weather_code", []),
+            wind_speed=hourly.get("wind_speed_10m", []),
+        )
+
+    def to_json(self) -> str:
+        return json.dumps(
+            [self.start, self.temperature.tolist(), self.humidity.tolist(), self.weather_code.tolist(),
+             self.wind_speed.tolist()]
+        )
+
+    @classmethod
+    def from_json(cls, raw: str | bytes) -> CellForecast:
+        start, temperature, humidity, weather_code, wind_speed = json.loads(raw)
+        return cls(start, temperature, humidity, weather_code, wind_speed)
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.weather_code) * HOUR
+
+    def at(self, timestamp: float) -> dict[str, Any] | None:
+        """Conditions for the hour containing ``timestamp``, shaped like Open-Meteo's ``current`` block."""
+        index = int((timestamp - self.start) // HOUR)
+        if not 0 <= index < len(self.weather_code):
+            return None
+        temperature, humidity, wind = self.temperature[index], self.humidity[index], self.wind_speed[index]
+        return {
+            "time": datetime.fromtimestamp(self.start + index * HOUR, timezone.utc).isoformat(),
+            "temperature_2m": None if temperature != temperature else round(temperature, 1),
+            "relative_humidity_2m": None if humidity != humidity else round(humidity),
+            "weather_code": self.weather_code[index],
+            "wind_speed_10m": None if wind != wind else round(wind, 1),
+        }
+
+
+class ForecastStore:
+    """Per-cell hourly forecasts, fetched a few days at a time and answered locally.
+
+    A cell is refetched ``FORECAST_REFRESH_SECONDS`` after its last fetch; until
+    then every lookup for any hour in its window is an array index. Expired
+    series keep answering while one background refresh per cell runs, and
+    batch prefetches ask Open-Meteo for up to ``FORECAST_BATCH_CELLS`` cells
+    per request.
+    """
+
+    def __init__(self) -> None:
+        self._cache = TTLCache(
+            name="forecast",
+            max_entries=Config.WEATHER_CACHE_MAX_ENTRIES,
+            default_ttl=Config.FORECAST_REFRESH_SECONDS,
+        )
+        self._refreshing: set[Cell] = set()
+        self._lock = threading.Lock()
+        self.upstream_calls = 0
+        self.cells_fetched = 0
+
+    def conditions_at(self, lat: float, lon: float, when: datetime | None = None) -> dict[str, Any]:
+        """Forecast conditions at ``when`` (default now; naive means UTC) for the point's cell.
+
+        Raises ``requests.RequestException`` when the cell has never been
+        fetched and Open-Meteo is unreachable, and ``ValueError`` when
+        ``when`` lies outside the forecast window.
+        """
+        cell = weather_cell(lat, lon)
+        when = when or datetime.now(timezone.utc)
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        timestamp = when.timestamp()
+
+        found = self._cache.lookup(cell)
+        if found is not None:
+            forecast, fresh = found
+            values = forecast.at(timestamp)
+            if values is not None:
+                if not fresh:
+                    self._schedule_refresh(cell)
+                return values
+
+        values = self._fetch_cell(cell).at(timestamp)
+        if values is None:
+            raise ValueError(f"{when} is outside the forecast window for cell {cell}")
+        return values
+
+    def prefetch(self, cells: Iterable[Cell]) -> int:
+        """Fetch every missing or expired cell, batching cells per upstream call; returns cells fetched."""
+        missing = []
+        for cell in dict.fromkeys(cells):
+            found = self._cache.lookup(cell)
+            if found is None or not found[1]:
+                missing.append(cell)
+
+        fetched = 0
+        for start in range(0, len(missing), Config.FORECAST_BATCH_CELLS):
+            batch = missing[start:start + Config.FORECAST_BATCH_CELLS]
+            try:
+                fetched += len(self._fetch(batch))
+            except Exception as exc:
+                logger.warning("Forecast prefetch failed for %d cells: %s", len(batch), exc)
+        return fetched
+
+    def _fetch(self, cells: list[Cell]) -> dict[Cell, CellForecast]:
+        response = upstream("open_meteo").get(
+            OPEN_METEO_URL,
+            params={
+                "latitude": ",".join(str(cell[0]) for cell in cells),
+                "longitude": ",".join(str(cell[1]) for cell in cells),
+                "hourly": ",".join(HOURLY_FIELDS),
+                "forecast_days": Config.FORECAST_DAYS,
+                "timezone": "GMT",
+                "timeformat": "unixtime",
+            },
+        )
+        response.raise_for_status()
+        payload = response.json()
+        # One location answers with an object, several with a list in request order
+        results = payload if isinstance(payload, list) else [payload]
+
+        forecasts = {cell: CellForecast.from_response(data) for cell, data in zip(cells, results)}
+        for cell, forecast in forecasts.items():
+            self._store(cell, forecast)
+        with self._lock:
+            self.upstream_calls += 1
+            self.cells_fetched += len(forecasts)
+        return forecasts
+
+    def _fetch_cell(self, cell: Cell) -> CellForecast:
+        forecast = single_flight.do(
+            f"forecast:{cell[0]},{cell[1]}",
+            lambda: self._fetch([cell])[cell],
+            shared=True,
+            encode=CellForecast.to_json,
+            decode=CellForecast.from_json,
+        )
+        self._store(cell, forecast)
+        return forecast
+
+    def _store(self, cell: Cell, forecast: CellForecast) -> None:
+        # Keep an expired series around for as long as it still covers the present
+        stale_ttl = max(0.0, forecast.end - datetime.now(timezone.utc).timestamp() - Config.FORECAST_REFRESH_SECONDS)
+        self._cache.set(cell, forecast, stale_ttl=stale_ttl)
+
+    def _schedule_refresh(self, cell: Cell) -> None:
+        with self._lock:
+            if cell in self._refreshing:
+                return
+            self._refreshing.add(cell)
+
+        def refresh() -> None:
+            try:
+                self._fetch_cell(cell)
+            except Exception as exc:
+                logger.info("Forecast refresh for %s failed; keeping the old series: %s", cell, exc)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(cell)
+
+        submit_background(refresh)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            counters = {"upstream_calls": self.upstream_calls, "cells_fetched": self.cells_fetched}
+        return {**self._cache.stats(), **counters}
+
+
+forecast_store = ForecastStore()
+
+
+def weather_at(lat: float, lon: float, when: datetime | None = None) -> dict[str, Any]:
+    """Conditions at ``when`` for the point's cell, from the forecast store."""
+    return forecast_store.conditions_at(lat, lon, when)
+
+
+def fetch_current_weather(lat: float, lon: float) -> dict[str, Any]:
+    """Current conditions for the cell containing the point, shaped like Open-Meteo's ``current`` block."""
+    return forecast_store.conditions_at(lat, lon)
@@ -0,0 +1,68 @@
+import os
+import sys
+
+import pytest
+
+# Unit tests never reach a database or Redis unless a test asks for Postgres below
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("REDIS_URL", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def pg_engines():
+    """Engines for two scratch Postgres databases standing in for the primary and its replica.
+
+    Set ``TEST_DATABASE_URL`` and ``TEST_DATABASE_REPLICA_URL`` (e.g. two
+    databases on a local server); every table is dropped and recreated in both.
+    """
+    urls = os.getenv("TEST_DATABASE_URL"), os.getenv("TEST_DATABASE_REPLICA_URL")
+    if not all(urls):
+        pytest.skip("set TEST_DATABASE_URL and TEST_DATABASE_REPLICA_URL to run Postgres tests")
+
+    from sqlalchemy import create_engine
+
+    import models  # noqa: F401  registers every table on Base.metadata
+    from database import Base
+
+    engines = [create_engine(url) for url in urls]
+    for engine in engines:
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+    yield engines
+    for engine in engines:
+        engine.dispose()
+
+
+@pytest.fixture
+def databases(pg_engines, monkeypatch):
+    """Point the app's session factories at the test primary and replica; empty both afterwards."""
+    from sqlalchemy import text
+    from sqlalchemy.orm import sessionmaker
+
+    import database
+    from services.activity import activity_tracker
+    from services.identity import identity_cache
+    from services.read_your_writes import recent_writers
+
+    primary, replica = pg_engines
+    database.SessionFactory.configure(bind=primary)
+    database.SessionLocal.remove()
+    monkeypatch.setattr(
+        database,
+        "ReplicaSessionFactory",
+        sessionmaker(bind=replica, autoflush=False, autocommit=False, expire_on_commit=False),
+    )
+    yield primary, replica
+
+    # Write buffered activity while the test primary is still bound
+    activity_tracker.flush()
+    database.SessionLocal.remove()
+    database.SessionFactory.configure(bind=database.engine)
+    identity_cache.clear()
+    recent_writers.clear()
+    tables = ", ".join(table.name for table in database.Base.metadata.sorted_tables)
+    for engine in pg_engines:
+        with engine.begin() as connection:
+            # Restarting ids keeps rows seeded on both databases under the same primary key
+            connection.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
@@ -0,0 +1,61 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from database import session_scope
+from models import Quest
+from services import quest_cache
+from services.identity import provision_user
+
+TODAY = date(2024, 6, 1)
+
+
+@pytest.fixture
+def quest(databases):
+    with session_scope() as session:
+        user = provision_user(session, "poller")
+        quest = Quest(user_id=user.id, date=TODAY, seed="s", generated_context={}, status="assigned")
+        session.add(quest)
+    yield quest
+    quest_cache.quest_response_cache.clear()
+
+
+def test_hit_while_status_is_unchanged(quest):
+    quest_cache.store(quest, b"body", quest_cache.current_version(quest.user_id, TODAY))
+    assert quest_cache.get_cached(quest.user_id, TODAY, None) == (quest_cache.quest_etag(quest), b"body")
+
+
+def test_status_change_by_another_worker_is_a_miss(quest, databases):
+    primary, _ = databases
+    quest_cache.store(quest, b"body", None)
+    # Another process's write: no ORM events fire here
+    with primary.begin() as connection:
+        connection.execute(text("UPDATE quests SET status = 'submitted' WHERE id = :id"), {"id": quest.id})
+    assert quest_cache.get_cached(quest.user_id, TODAY, None) is None
+
+
+def test_entry_survives_until_the_status_change_commits(quest):
+    quest_cache.store(quest, b"body", None)
+    key = (quest.user_id, TODAY)
+    with session_scope() as session:
+        session.get(Quest, quest.id).status = "submitted"
+        session.flush()
+        assert quest_cache.quest_response_cache.get(key) is not None
+    assert quest_cache.quest_response_cache.get(key) is None
+
+
+def test_rolled_back_change_keeps_the_entry(quest):
+    quest_cache.store(quest, b"body", None)
+    with pytest.raises(RuntimeError):
+        with session_scope() as session:
+            session.get(Quest, quest.id).status = "submitted"
+            session.flush()
+            raise RuntimeError
+    assert quest_cache.get_cached(quest.user_id, TODAY, None) is not None
+
+
+def test_outdated_shared_version_is_a_miss(quest):
+    quest_cache.store(quest, b"body", 3)
+    assert quest_cache.get_cached(quest.user_id, TODAY, 3) is not None
+    assert quest_cache.get_cached(quest.user_id, TODAY, 4) is None
@@ -0,0 +1,93 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from models import User
+from models.quest_template import QuestRarity, QuestTemplate
+from services import quest_builder
+from services.quest_builder import quest_rng, quest_seed, render_quest_values
+from services.quest_pipeline import QuestJob, render_quest, select_weighted_template
+from services.templates import CompiledTemplateIndex
+
+WEATHERS = [
+    {"conditions": ["sunny"], "temperature": 22},
+    {"conditions": ["rainy"], "temperature": 9},
+    {"conditions": [], "temperature": 15},
+]
+CATEGORIES = ["outdoor", "urban", "nature", "food"]
+
+
+def _template(template_id: int) -> QuestTemplate:
+    return QuestTemplate(
+        id=template_id,
+        name=f"template-{template_id}",
+        title=f"Quest {template_id} in {{location}}",
+        description=f"Photograph something #{template_id} around {{location}}.",
+        rarity=list(QuestRarity)[template_id % 3],
+        category=CATEGORIES[template_id % len(CATEGORIES)],
+        hints=[f"hint {template_id}"],
+        weather_conditions=[["sunny"], ["rainy"], []][template_id % 3],
+        location_types=[],
+        estimated_duration_minutes=30,
+        difficulty_level=1 + template_id % 5,
+        weight=10 * (1 + template_id % 7),
+        updated_at=datetime(2024, 1, 1),
+    )
+
+
+@pytest.fixture
+def template_index(monkeypatch):
+    compiled = CompiledTemplateIndex(_template(template_id) for template_id in range(1, 41))
+    monkeypatch.setattr(quest_builder.template_index, "get", lambda: compiled)
+    return compiled
+
+
+def _jobs(count: int) -> list[QuestJob]:
+    jobs = []
+    for n in range(count):
+        user = User(
+            id=n,
+            username=f"user{n % 500}",
+            privacy="public",
+            quest_preferences={"categories": [CATEGORIES[n % 5]] if n % 5 < len(CATEGORIES) else []},
+            default_location_name=f"Neighbourhood {n % 13}",
+        )
+        jobs.append(QuestJob(
+            user_id=n,
+            quest_date=date(2024, 6, 1) + timedelta(days=n % 30),
+            user=user,
+            weather=dict(WEATHERS[n % len(WEATHERS)]),
+            places=[{"name": f"Place {n % 17}", "osm_id": f"node/{n % 17}"}],
+            delivered_at=datetime(2024, 6, 1, 7),
+        ))
+    return jobs
+
+
+def _generate(job: QuestJob) -> tuple:
+    select_weighted_template(job)
+    render_quest(job)
+    return job.seed, job.template.id, job.values
+
+
+def test_parallel_generation_matches_serial(template_index):
+    serial = [_generate(job) for job in _jobs(3000)]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        parallel = list(pool.map(_generate, _jobs(3000)))
+
+    assert parallel == serial
+    # The draw really varies, so a constant result cannot pass by accident
+    assert len({template_id for _, template_id, _ in serial}) > 10
+
+
+def test_same_seed_draws_the_same_template(template_index):
+    user = User(id=1, username="alice", privacy="public", quest_preferences={})
+    seed = quest_seed(user.username, date(2024, 6, 1))
+    weather = WEATHERS[0]
+    picks = {quest_builder.select_quest_template(user, weather, quest_rng(seed)).id for _ in range(50)}
+    assert len(picks) == 1
+
+    template = next(iter(template_index.templates))
+    first = render_quest_values(user, date(2024, 6, 1), seed, template, weather, [], datetime(2024, 6, 1, 7))
+    second = render_quest_values(user, date(2024, 6, 1), seed, template, weather, [], datetime(2024, 6, 1, 7))
+    assert first == second
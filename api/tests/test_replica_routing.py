@@ -0,0 +1,81 @@
+import pytest
+from flask import Flask, g
+from sqlalchemy import text
+
+import auth
+from database import read_only, request_scope
+from models import User
+from services import read_your_writes
+
+app = Flask(__name__)
+
+
+def _seed(engine, username: str, display_name: str) -> int:
+    with engine.begin() as connection:
+        return connection.execute(
+            text(
+                "INSERT INTO users (username, display_name, privacy, prefs, quest_preferences, "
+                "location_radius_km, onboarding_completed, created_at) "
+                "VALUES (:username, :display_name, 'public', '{}', '{}', 2.0, false, now()) RETURNING id"
+            ),
+            {"username": username, "display_name": display_name},
+        ).scalar_one()
+
+
+@pytest.fixture
+def alice(databases):
+    primary, replica = databases
+    # Same row on both sides, told apart by display name
+    user_id = _seed(primary, "alice", "on primary")
+    assert _seed(replica, "alice", "on replica") == user_id
+    return User(id=user_id, username="alice")
+
+
+def _display_name(user_id: int) -> str:
+    with request_scope() as session:
+        return session.get(User, user_id).display_name
+
+
+@read_only
+def _read_only_display_name(user_id: int) -> str:
+    return _display_name(user_id)
+
+
+def test_read_only_handlers_read_from_the_replica(alice):
+    with app.test_request_context():
+        g.current_user = alice
+        assert _read_only_display_name(alice.id) == "on replica"
+
+
+def test_other_handlers_read_from_the_primary(alice):
+    with app.test_request_context():
+        g.current_user = alice
+        assert _display_name(alice.id) == "on primary"
+
+
+def test_recent_writers_read_their_writes_from_the_primary(alice):
+    read_your_writes.mark_writer(alice.id)
+    with app.test_request_context():
+        g.current_user = alice
+        assert _read_only_display_name(alice.id) == "on primary"
+
+
+def test_writes_mark_the_request_as_writing(alice):
+    with app.test_request_context():
+        g.current_user = alice
+        with request_scope() as session:
+            session.get(User, alice.id).bio = "hello"
+        assert g.get("db_wrote")
+        g.db_session.commit()
+
+
+def test_provisioning_is_not_a_user_write(databases):
+    primary, _ = databases
+    with app.test_request_context(headers={"X-Debug-User": "newcomer"}):
+        user = auth.get_current_user()
+        assert user.username == "newcomer"
+        # Committed on its own session, leaving the request's untouched
+        assert not g.get("db_wrote")
+        assert g.get("db_session") is None
+    with primary.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM users WHERE username = 'newcomer'")).scalar_one() == 1